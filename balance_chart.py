@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Remaining-balance line charts built straight from schedule arrays.
+
+Each series becomes one WebGL (Scattergl) trace holding its month and
+balance arrays, which plotly ships to the browser as compact typed arrays.
+Series longer than max_points are thinned with Largest-Triangle-Three-Buckets
+(LTTB), which keeps the visual shape of a line (its first and last points and
+every bend) with a fraction of the points, so overlaying many scenarios or
+simulation bands keeps the figure small.
+"""
+import numpy as np
+
+# Points kept per series; a 40-year monthly schedule (480 points) is drawn in full
+DEFAULT_MAX_POINTS = 500
+
+# Headroom above the largest balance, as on the original charts
+Y_AXIS_HEADROOM = 50000
+
+
+# Indices of num_points samples of (x, y) chosen by LTTB. Always keeps the first
+# and last points; returns every index when the series is already short enough.
+def lttb(x, y, num_points):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    size = x.size
+    if num_points >= size or num_points < 3:
+        return np.arange(size)
+
+    # num_points - 2 buckets between the first and last points
+    edges = np.linspace(1, size - 1, num_points - 1).astype(np.int64)
+    edges = np.append(edges, size)
+    indices = np.empty(num_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, size - 1
+
+    selected = 0
+    for bucket in range(num_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Average of the next bucket (just the last point for the final bucket)
+        next_start, next_end = (end, edges[bucket + 2]) if bucket < num_points - 3 else (size - 1, size)
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+
+        # Keep the point forming the largest triangle with the previous pick and that average
+        area = np.abs(
+            (x[selected] - next_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (next_y - y[selected])
+        )
+        selected = start + int(np.argmax(area))
+        indices[bucket + 1] = selected
+    return indices
+
+
+# WebGL line chart of (name, months, balances) series, each thinned to max_points
+# (None draws every point)
+def balance_figure(series, title, max_points=DEFAULT_MAX_POINTS, xaxis_title='Number of Payments',
+                   yaxis_title='Remaining Balance (R)', legend_title='Balance Type'):
+    # Loaded with the first chart rather than with the page
+    import plotly.graph_objects as go
+
+    figure = go.Figure()
+    top = 0.0
+    for name, months, balances in series:
+        months = np.asarray(months)
+        balances = np.asarray(balances, dtype=float)
+        if balances.size:
+            top = max(top, float(balances.max()))
+        if max_points:
+            keep = lttb(months, balances, max_points)
+            months, balances = months[keep], balances[keep]
+        figure.add_trace(go.Scattergl(
+            x=months, y=balances, mode='lines', name=name,
+            hovertemplate='Payment %{x}<br>R%{y:,.2f}',
+        ))
+
+    figure.update_layout(
+        title=title,
+        xaxis_title=xaxis_title,
+        yaxis_title=yaxis_title,
+        showlegend=True,
+        legend_title_text=legend_title,
+        yaxis=dict(range=[0, top + Y_AXIS_HEADROOM], rangemode='tozero'),
+    )
+    return figure
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the calculator's hot paths, full-page reruns and cold starts.
+
+Each benchmark runs over a sweep of loan terms (5-40 years) and rates
+(0-30%), and the results are written as JSON so runs can be compared between
+releases:
+
+    python benchmarks/bench_calculator.py --output bench_results.json
+
+The app functions (calculate_loan_term, calculate_balance_series, ...)
+are loaded from the Streamlit scripts themselves without running the page,
+so the numbers track the code that actually ships.
+"""
+import argparse
+import ast
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import balance_chart  # noqa: E402
+import loan_engine  # noqa: E402
+import scenario_cache  # noqa: E402
+
+APP_SCRIPT = os.path.join(ROOT, "homeloancalculator.py")
+HOME2_SCRIPT = os.path.join(ROOT, "home2.py")
+LOAN_AMOUNT = 1000000
+TERMS = list(range(5, 45, 5))
+RATES = [0.0, 2.5, 5.0, 7.5, 10.0, 11.75, 15.0, 20.0, 25.0, 30.0]
+
+
+# Compile selected top-level functions from an app script without running the page
+def load_app_functions(path, names):
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    module = ast.Module(
+        body=[node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name in names],
+        type_ignores=[],
+    )
+    namespace = {"np": np, "pd": pd, "loan_engine": loan_engine, "scenario_cache": scenario_cache}
+    exec(compile(module, path, "exec"), namespace)
+    missing = set(names) - set(namespace)
+    if missing:
+        raise RuntimeError(f"{path} does not define {', '.join(sorted(missing))}")
+    return namespace
+
+
+# Time fn() `repeat` times, each timing averaged over enough calls to take ~min_time seconds
+def measure(fn, repeat, min_time=0.02):
+    start = time.perf_counter()
+    fn()
+    calls = max(1, int(min_time / max(time.perf_counter() - start, 1e-9)))
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        timings.append((time.perf_counter() - start) / calls)
+    return {
+        "calls": calls * repeat,
+        "best_s": min(timings),
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.fmean(timings),
+    }
+
+
+def sweep(name, make_fn, repeat, terms=TERMS, rates=RATES, rows=None):
+    results = []
+    for term in terms:
+        for rate in rates:
+            result = measure(make_fn(term, rate), repeat)
+            result.update(benchmark=name, loan_term=term, interest_rate=rate)
+            if rows is not None:
+                result["rows"] = rows(term, rate)
+                result["rows_per_s"] = result["rows"] / result["median_s"]
+            results.append(result)
+            print(f"{name:<34} term={term:>2} rate={rate:>5.2f}%  {result['median_s'] * 1e6:>10.1f} us")
+    return results
+
+
+def bench_payment(repeat):
+    return sweep("monthly_payment", lambda term, rate: lambda: loan_engine.monthly_payment(LOAN_AMOUNT, rate, term), repeat)
+
+
+def bench_schedule(repeat):
+    return sweep(
+        "generate_amortization_schedule",
+        lambda term, rate: lambda: loan_engine.amortization_schedule(LOAN_AMOUNT, rate, term),
+        repeat,
+        rows=lambda term, rate: term * 12,
+    )
+
+
+def bench_cent_schedule(repeat):
+    return sweep(
+        "cent_amortization_schedule",
+        lambda term, rate: lambda: loan_engine.cent_amortization_schedule(LOAN_AMOUNT, rate, term),
+        repeat,
+        rows=lambda term, rate: term * 12,
+    )
+
+
+def bench_loan_term(repeat, app):
+    calculate_loan_term = app["calculate_loan_term"]
+
+    def make_fn(term, rate):
+        payment = loan_engine.monthly_payment(LOAN_AMOUNT, rate, term)
+        return lambda: calculate_loan_term(LOAN_AMOUNT, payment, rate, term, 0)
+
+    # Worst case for an iterative solver: the payment never covers the interest
+    def make_non_amortizing_fn(term, rate):
+        payment = LOAN_AMOUNT * rate / 12 / 100 / 2
+        return lambda: calculate_loan_term(LOAN_AMOUNT, payment, rate, term, 0)
+
+    return (
+        sweep("calculate_loan_term", make_fn, repeat)
+        + sweep("calculate_loan_term[non_amortizing]", make_non_amortizing_fn, repeat, rates=[rate for rate in RATES if rate > 0])
+    )
+
+
+def bench_balance_chart(repeat, app):
+    calculate_balance_series = app["calculate_balance_series"]
+
+    # Uncached scenarios, so the schedules are part of the measurement
+    def make_fn(term, rate):
+        def run():
+            original = scenario_cache._compute_scenario(LOAN_AMOUNT, rate, term, 0)
+            updated = scenario_cache._compute_scenario(LOAN_AMOUNT, rate, term, 2000)
+            return balance_chart.balance_figure(calculate_balance_series(original, updated), title="")
+        return run
+
+    return sweep("balance_chart", make_fn, repeat, rows=lambda term, rate: term * 12 * 2)
+
+
+# Full headless reruns of the page through Streamlit's testing harness
+def bench_rerun(repeat, terms, rates):
+    from streamlit.testing.v1 import AppTest
+
+    os.environ.setdefault("LOTTIE_OFFLINE", "1")
+    app = AppTest.from_file(APP_SCRIPT, default_timeout=60).run()
+    results = []
+    for cache_state in ("cold", "warm"):
+        def make_fn(term, rate):
+            def run():
+                if cache_state == "cold":
+                    scenario_cache.cache.clear()
+                app.sidebar.number_input[1].set_value(rate)
+                app.sidebar.number_input[2].set_value(term)
+                app.run()
+                if app.exception:
+                    raise RuntimeError(app.exception[0].value)
+            return run
+        results += sweep(f"full_rerun[{cache_state}]", make_fn, repeat, terms=terms, rates=rates)
+    return results
+
+
+# One page load in a fresh interpreter, as after a server restart
+COLD_START_CODE = """
+import sys
+from streamlit.testing.v1 import AppTest
+
+AppTest.from_file(sys.argv[1], default_timeout=60).run()
+"""
+
+
+# Time to the loan summary on a cold process, where the page also pays for its
+# imports. Each run is a new interpreter with stage timing on; the times (and the
+# memory the session holds) are read from the timing line it logs.
+def bench_cold_start(runs, scripts=(APP_SCRIPT, HOME2_SCRIPT)):
+    env = dict(os.environ, LOAN_CALC_TIMING="1", LOTTIE_OFFLINE="1")
+    results = []
+    for script in scripts:
+        first_summary, totals, session_bytes = [], [], []
+        for _ in range(runs):
+            completed = subprocess.run(
+                [sys.executable, "-c", COLD_START_CODE, script], cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+            )
+            record = next(json.loads(line) for line in completed.stderr.splitlines() if '"rerun_timing"' in line)
+            first_summary.append(record["marks_ms"]["first_summary"] / 1000)
+            totals.append(record["total_ms"] / 1000)
+            session_bytes.append(record["memory"]["session_bytes"])
+        name = f"cold_start[{os.path.basename(script)}]"
+        results.append({
+            "benchmark": name,
+            "calls": runs,
+            "best_s": min(first_summary),
+            "median_s": statistics.median(first_summary),
+            "mean_s": statistics.fmean(first_summary),
+            "total_median_s": statistics.median(totals),
+            "session_bytes": max(session_bytes),
+        })
+        print(f"{name:<34} first summary {results[-1]['median_s'] * 1e3:>8.1f} ms  full page {results[-1]['total_median_s'] * 1e3:>8.1f} ms")
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    versions = {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__}
+    try:
+        import streamlit
+        versions["streamlit"] = streamlit.__version__
+    except ImportError:
+        pass
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "versions": versions,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the home loan calculator.")
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repeats per sweep point (default: %(default)s)")
+    parser.add_argument("--skip-rerun", action="store_true", help="skip the full-page Streamlit reruns and cold starts")
+    args = parser.parse_args(argv)
+
+    app = load_app_functions(APP_SCRIPT, ["calculate_balance_series"])
+    # Only home2 still solves the updated term from the payment
+    app.update(load_app_functions(HOME2_SCRIPT, ["calculate_loan_term"]))
+    results = (
+        bench_payment(args.repeat)
+        + bench_schedule(args.repeat)
+        + bench_cent_schedule(args.repeat)
+        + bench_loan_term(args.repeat, app)
+        + bench_balance_chart(args.repeat, app)
+    )
+    if not args.skip_rerun:
+        results += bench_rerun(max(1, args.repeat // 2), terms=[5, 20, 40], rates=[0.0, 11.75, 30.0])
+        results += bench_cold_start(args.repeat)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
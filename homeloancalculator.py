@@ -4,15 +4,20 @@ Created on Tue Sep  5 08:26:00 2023
 
 @author: anthea
 """
-import requests
 import streamlit as st
-import numpy as np
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
 import calendar
-from streamlit_lottie import st_lottie
+import stage_timer
+
+# Optional per-stage timing of this rerun (LOAN_CALC_TIMING=1 or ?timing=1), started
+# before the imports so that a cold start counts them
+run_timer = stage_timer.start_run("homeloancalculator")
+
+import numpy as np
 from streamlit_extras.stylable_container import stylable_container
+import loan_engine
+import scenario_cache
+import lottie_cache
+# pandas, plotly and the Lottie component are imported once the loan summary is drawn
 
 # Streamlit page configuration
 st.set_page_config(
@@ -21,6 +26,7 @@ st.set_page_config(
     layout="centered",
     initial_sidebar_state="expanded",
 )
+run_timer.lap("imports")
 
 # Hide "Made with Streamlit" footer menu
 hide_streamlit_footer = """<style>#MainMenu {visibility: hidden;}
@@ -29,15 +35,11 @@ st.markdown(hide_streamlit_footer, unsafe_allow_html=True)
 
 # Function to load Lottie animation from URL
 def load_lottieurl(url):
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
+    # Served from the local cache; None when offline or the download fails
+    return lottie_cache.load_lottie(url)
 
-# Load Lottie animation
-lottie_coding = load_lottieurl("https://lottie.host/488138f0-954d-4e4f-a6ac-a5847226b2a3/IqZMv94lzs.json")
-
-st_lottie(lottie_coding, height=100, key="coding")
+# The animation is drawn here after the loan summary, which matters more
+lottie_slot = st.container()
 
 st.write("A tool to estimate your monthly loan payments and measure the impact of changes on your loan.")
 st.sidebar.header("Home Loan Calculator")
@@ -56,6 +58,17 @@ start_month_options = [
     for month in range(1, 13)
 ]
 start_month = st.sidebar.selectbox("Select Start Month", start_month_options, index=0)
+interest_accrual = st.sidebar.radio(
+    "Interest Accrual",
+    ["Monthly", "Daily"],
+    horizontal=True,
+    help="Daily accrues interest on the balance for each calendar day from the start month and debits it monthly, as banks do.",
+)
+daily_accrual = interest_accrual == "Daily"
+exact_cents = st.sidebar.toggle(
+    "Round to the Cent",
+    help="Round each payment and month's interest to the cent like a bank statement; the final payment settles the difference. Uses monthly accrual.",
+)
 st.sidebar.markdown("---")
 
 # Extract the selected start month and year
@@ -63,28 +76,19 @@ selected_start_month, selected_start_year_with_parentheses = start_month.split()
 selected_start_month = list(calendar.month_name).index(selected_start_month)
 selected_start_year = int(selected_start_year_with_parentheses.strip("()"))
 
-# Calculate monthly payment
-monthly_interest_rate = interest_rate / 12 / 100
-num_payments = loan_term * 12
-monthly_payment = loan_amount * (monthly_interest_rate * (1 + monthly_interest_rate) ** num_payments) / ((1 + monthly_interest_rate) ** num_payments - 1)
-
-# Calculate amortization schedule
-amortization_schedule = []
-
-remaining_principal = loan_amount
-for month in range(1, num_payments + 1):
-    interest_payment = remaining_principal * monthly_interest_rate
-    principal_payment = monthly_payment - interest_payment
-    remaining_principal -= principal_payment
-    amortization_schedule.append([month, monthly_payment, principal_payment, interest_payment, remaining_principal])
-
-# Create a DataFrame for the amortization schedule
-amortization_df = pd.DataFrame(amortization_schedule, columns=['Month', 'Monthly Payment', 'Principal Payment', 'Interest Payment', 'Remaining Principal'])
-
-# Calculate payoff date based on the last date in the amortization table
-last_month = amortization_df.iloc[-1]['Month']
-payoff_date = pd.to_datetime(f"{selected_start_year}-{selected_start_month}-01") + pd.DateOffset(months=last_month)
-st.session_state.num_payments = num_payments
+# The summary figures come first. For a plain monthly loan they are taken from the
+# closed form, which needs neither the schedule nor pandas; daily accrual and cent
+# rounding need the full schedule.
+extra_payment = 0
+if daily_accrual or exact_cents:
+    summary_scenario = scenario_cache.loan_scenario(
+        loan_amount, interest_rate, loan_term, extra_payment, selected_start_year, selected_start_month,
+        daily_accrual=daily_accrual, exact_cents=exact_cents,
+    )
+else:
+    summary_scenario = scenario_cache.scenario_summary(loan_amount, interest_rate, loan_term, extra_payment, selected_start_year, selected_start_month)
+monthly_payment = summary_scenario['monthly_payment']
+payoff_date = summary_scenario['payoff_date']
 
 # Create a stylable container for the loan summary
 with stylable_container(
@@ -122,7 +126,7 @@ with stylable_container(
     with col2:
         st.markdown(f"""
             <p style="font-weight: lighter; color: #888; margin-bottom: 8px;">Interest paid</p>
-            <span style="font-size: 20px; color: #000;">R{amortization_df['Interest Payment'].sum():,.2f}</span>
+            <span style="font-size: 20px; color: #000;">R{summary_scenario['total_interest']:,.2f}</span>
         """, unsafe_allow_html=True)
 
     # Monthly Payment
@@ -142,53 +146,27 @@ with stylable_container(
     # Close the summary box
     st.markdown('</div>', unsafe_allow_html=True)
 
-# Create an empty DataFrame with column names
-amortization_df = pd.DataFrame(columns=["Month", "Payment", "Principal", "Interest", "Balance"])
-
-balance = loan_amount
-total_interest_paid = 0  # Initialize total interest paid
-
-# Initialize an empty list to store row data
-row_data_list = []
-
-for month in range(1, num_payments + 1):
-    interest_payment = balance * monthly_interest_rate
-    principal_payment = monthly_payment - interest_payment
-    balance -= principal_payment
-    total_interest_paid += interest_payment  # Accumulate interest payments
+run_timer.mark("first_summary")
+run_timer.lap("summary_card")
 
-    # Append the data to the list with thousand separators
-    row_data = {
-        "Month": f"{calendar.month_name[selected_start_month]} {selected_start_year}",
-        "Payment": f"R{monthly_payment:,.2f}",
-        "Principal": f"R{principal_payment:,.2f}",
-        "Interest": f"R{interest_payment:,.2f}",
-        "Balance": f"R{balance:,.2f}",
-    }
-    row_data_list.append(row_data)
-
-    # Update the selected month and year
-    selected_start_month += 1
-    if selected_start_month > 12:
-        selected_start_month = 1
-        selected_start_year += 1
+# Load Lottie animation
+from streamlit_lottie import st_lottie
 
-# Create a DataFrame from the list of row data
-amortization_df = pd.DataFrame(row_data_list)
+lottie_coding = load_lottieurl("https://lottie.host/488138f0-954d-4e4f-a6ac-a5847226b2a3/IqZMv94lzs.json")
 
-# Update the selected month and year
-selected_start_month += 1
-if selected_start_month > 12:
-    selected_start_month = 1
-    selected_start_year += 1
+if lottie_coding:
+    with lottie_slot:
+        st_lottie(lottie_coding, height=100, key="coding")
+run_timer.lap("lottie")
 
-selected_month = list(amortization_df["Month"])
+# Everything below needs pandas or plotly
+import pandas as pd
+import balance_chart
+import schedule_export
+import loan_sensitivity
+import loan_simulation
+run_timer.lap("deferred_imports")
 
-if st.checkbox("Show Amortization Table"):
-    st.write(f"Below is the amortization schedule for a R{loan_amount:,} home loan, for {loan_term} years with a {interest_rate}% fixed rate: ")
-    st.dataframe(amortization_df, hide_index=True, use_container_width=True)
-#st.markdown("---")
-st.write("##")
 # Initialize new_total_payment with the original payment
 new_total_payment = 0
 # Initialize new_loan_term_difference with a default value
@@ -201,7 +179,6 @@ new_extra_payment = 0
 # loan_term = 30
 new_interest_rate_input = interest_rate
 new_loan_term_input = loan_term
-extra_payment = 0
 
 # Display the input widgets in the sidebar
 st.sidebar.subheader("Change loan details below:")
@@ -209,51 +186,136 @@ new_interest_rate_input = st.sidebar.number_input("New Interest Rate (%)", value
 new_loan_term_input = st.sidebar.number_input("New Loan Term (Years)", value=new_loan_term_input, step=1)
 new_extra_payment_input = st.sidebar.number_input("New Extra Monthly Payment (R)", value=0, step=10)
 
+# Timeline of rate changes (payment number -> new rate) applied to the updated loan
+with st.sidebar.expander("Interest Rate Changes"):
+    rate_change_rows = st.data_editor(
+        pd.DataFrame({"Payment Number": pd.Series(dtype="int64"), "New Rate (%)": pd.Series(dtype="float64")}),
+        num_rows="dynamic",
+        hide_index=True,
+        column_config={
+            "Payment Number": st.column_config.NumberColumn(min_value=1, max_value=600, step=1),
+            "New Rate (%)": st.column_config.NumberColumn(min_value=0.0, max_value=100.0, step=0.25, format="%.2f"),
+        },
+        key="rate_changes",
+    ).dropna()
+    new_rate_changes = dict(zip(rate_change_rows["Payment Number"].astype(int), rate_change_rows["New Rate (%)"]))
+
+# One-off lump sums (bonus, tax refund) paid with a given payment of the updated loan
+with st.sidebar.expander("Lump-Sum Payments"):
+    lump_sum_rows = st.data_editor(
+        pd.DataFrame({"Payment Number": pd.Series(dtype="int64"), "Amount (R)": pd.Series(dtype="float64")}),
+        num_rows="dynamic",
+        hide_index=True,
+        column_config={
+            "Payment Number": st.column_config.NumberColumn(min_value=1, max_value=600, step=1),
+            "Amount (R)": st.column_config.NumberColumn(min_value=0.0, step=1000.0, format="R%,.2f"),
+        },
+        key="lump_sums",
+    ).dropna()
+    # Several lump sums on the same payment add up
+    new_lump_sums = lump_sum_rows.groupby(lump_sum_rows["Payment Number"].astype(int))["Amount (R)"].sum().to_dict()
+
+# The inverse questions: the most a budget can borrow, and the rate a quoted payment implies
+with st.sidebar.expander("Affordability & Quote Check"):
+    # A zero term has no finite payment, so there is nothing to solve for
+    current_payment = float(loan_engine.monthly_payment(loan_amount, interest_rate, loan_term))
+    term_is_payable = np.isfinite(current_payment)
+
+    monthly_budget = st.number_input("Monthly Budget (R)", value=15000, min_value=0, step=500)
+    if term_is_payable:
+        max_loan = loan_engine.max_loan_amount(monthly_budget, interest_rate, loan_term)
+        st.write(f"At {interest_rate}% over {loan_term} years you can borrow up to **R{max_loan:,.2f}**.")
+
+    quoted_payment = st.number_input("Quoted Monthly Payment (R)", value=round(current_payment, 2) if term_is_payable else 0.0, min_value=0.0, step=100.0)
+    if term_is_payable:
+        quoted_rate = loan_engine.implied_rate(loan_amount, quoted_payment, loan_term)
+        if np.isnan(quoted_rate):
+            st.write(f"R{quoted_payment:,.2f} a month does not repay R{loan_amount:,} over {loan_term} years at any rate.")
+        else:
+            st.write(f"R{quoted_payment:,.2f} a month on R{loan_amount:,} over {loan_term} years implies a rate of **{quoted_rate:.2f}%**.")
+    else:
+        st.write("Enter a loan term of at least one month to check affordability.")
+
 # Initialize session_state variables
 st.session_state.new_interest_rate = st.session_state.get("new_interest_rate", interest_rate)
 st.session_state.new_loan_term = st.session_state.get("new_loan_term", loan_term)
 st.session_state.new_extra_payment = st.session_state.get("new_extra_payment", 0)
+run_timer.lap("inputs")
+
+# Compute each scenario once per rerun (served from cache when unchanged).
+# The amortization table and balance chart read from these.
+# The original loan is kept for the session and only looked up again when its own
+# inputs change, so tweaking the "Change loan details" inputs only prices the update.
+# The session holds a reference to the shared cache's scenario, not a copy, and no
+# table: the amortization table is built per page.
+baseline_key = (loan_amount, interest_rate, loan_term, selected_start_year, selected_start_month, daily_accrual, exact_cents)
+if st.session_state.get("baseline_key") != baseline_key:
+    st.session_state.baseline_key = baseline_key
+    st.session_state.baseline_scenario = scenario_cache.loan_scenario(
+        loan_amount, interest_rate, loan_term, extra_payment, selected_start_year, selected_start_month,
+        daily_accrual=daily_accrual, exact_cents=exact_cents,
+    )
+baseline_scenario = st.session_state.baseline_scenario
+updated_scenario = scenario_cache.loan_scenario(
+    loan_amount, new_interest_rate_input, new_loan_term_input, new_extra_payment_input,
+    selected_start_year, selected_start_month, rate_changes=new_rate_changes, lump_sums=new_lump_sums,
+    daily_accrual=daily_accrual, exact_cents=exact_cents,
+)
 
+num_payments = loan_term * 12
+amortization_df = baseline_scenario['schedule']
+run_timer.lap("scenarios")
+st.session_state.num_payments = num_payments
 
-def generate_amortization_schedule(loan_amount, new_interest_rate, new_loan_term, new_extra_payment):
-    monthly_interest_rate = new_interest_rate / 12 / 100
-    num_payments = new_loan_term * 12
-    monthly_payment = (loan_amount * (monthly_interest_rate * (1 + monthly_interest_rate) ** num_payments) / ((1 + monthly_interest_rate) ** num_payments - 1) + new_extra_payment)
-
-    amortization_schedule = []
-
-    remaining_balance = loan_amount
-
-    for month in range(1, int(num_payments) + 1):
-        interest_payment = remaining_balance * monthly_interest_rate 
-        principal_payment = monthly_payment - interest_payment 
-        remaining_balance -= principal_payment 
-
-        amortization_schedule.append({
-            'Month': month,
-            'Principal Payment': principal_payment,
-            'Interest Payment': interest_payment,
-            'Remaining Balance': remaining_balance
-        })
+# Currency formatting is applied by the table at display time
+amortization_column_config = {
+    "Month": st.column_config.DateColumn("Month", format="MMMM YYYY"),
+    "Payment": st.column_config.NumberColumn("Payment", format="R%,.2f"),
+    "Principal": st.column_config.NumberColumn("Principal", format="R%,.2f"),
+    "Interest": st.column_config.NumberColumn("Interest", format="R%,.2f"),
+    "Balance": st.column_config.NumberColumn("Balance", format="R%,.2f"),
+}
+rows_per_page = 60  # Five years of payments per page
 
-    return pd.DataFrame(amortization_schedule)
+if st.checkbox("Show Amortization Table"):
+    accrual_text = " accrued daily" if daily_accrual else ""
+    st.write(f"Below is the amortization schedule for a R{loan_amount:,} home loan, for {loan_term} years with a {interest_rate}% fixed rate{accrual_text}: ")
+    # Build only the page being shown, so no table is kept between reruns
+    num_pages = max(-(-len(amortization_df) // rows_per_page), 1)
+    page = st.number_input("Page", min_value=1, max_value=num_pages, value=1, step=1) if num_pages > 1 else 1
+    first_row = (page - 1) * rows_per_page
+    page_rows = loan_engine.schedule_table(amortization_df.iloc[first_row:first_row + rows_per_page], selected_start_year, selected_start_month)
+    st.dataframe(page_rows, hide_index=True, use_container_width=True, column_config=amortization_column_config)
+    st.caption(f"Payments {first_row + 1} to {first_row + len(page_rows)} of {len(amortization_df)}")
+
+    # Download the schedule, optionally with the updated loan; the file is only built when clicked
+    export_columns = st.columns([1, 2, 1], vertical_alignment="bottom")
+    export_format = export_columns[0].selectbox("File Format", schedule_export.available_formats(), format_func=str.upper)
+    include_updated = export_columns[1].checkbox("Include the updated loan")
+    export_schedules = {'Original': amortization_df}
+    if include_updated:
+        export_schedules['Updated'] = updated_scenario['schedule']
+    export_extension, export_mime = schedule_export.EXPORT_FORMATS[export_format]
+    export_columns[2].download_button(
+        "Download",
+        data=lambda schedules=export_schedules, file_format=export_format: schedule_export.export_bytes(
+            schedules, file_format, selected_start_year, selected_start_month,
+        ),
+        file_name=f"amortization_schedule{export_extension}",
+        mime=export_mime,
+    )
+#st.markdown("---")
+st.write("##")
+run_timer.lap("amortization_table")
 
 
 new_total_interest_paid = 0
 
-def calculate_loan_changes(loan_amount, interest_rate, loan_term, extra_payment, new_interest_rate, new_loan_term, new_extra_payment):
-    # Original calculations
-    monthly_interest_rate = interest_rate / 12 / 100
-    num_payments = loan_term * 12
-    monthly_payment = loan_amount * (monthly_interest_rate * (1 + monthly_interest_rate) ** num_payments) / ((1 + monthly_interest_rate) ** num_payments - 1)
-
-    # New calculations
-    new_monthly_interest_rate = new_interest_rate / 12 / 100
-    new_num_payments = new_loan_term * 12
-    if new_loan_term < loan_term:
-        new_num_payments = new_loan_term * 12
-    new_total_payment = (loan_amount * (new_monthly_interest_rate * (1 + new_monthly_interest_rate) ** new_num_payments) / ((1 + new_monthly_interest_rate) ** new_num_payments - 1) + new_extra_payment)
-    
+def calculate_loan_changes(original_scenario, updated_scenario):
+    # Original and new monthly payments
+    monthly_payment = original_scenario['monthly_payment']
+    new_total_payment = updated_scenario['total_payment']
+
     # Calculate the payment difference
     payment_difference = monthly_payment - new_total_payment
 
@@ -264,57 +326,8 @@ def calculate_loan_changes(loan_amount, interest_rate, loan_term, extra_payment,
     }
 
 
-def calculate_loan_term(loan_amount, monthly_payment, interest_rate, loan_term, extra_payment):
-    # Calculate the monthly interest rate
-    monthly_interest_rate = interest_rate / 12 / 100
-
-    # Calculate the number of payments
-    num_payments = loan_term * 12
-
-    # Initialize the remaining balance
-    remaining_balance = loan_amount
-
-    # Initialize the number of months
-    months_elapsed = 0
-
-    # Add a safeguard to limit the number of iterations
-    max_iterations = 10000  # You can adjust this value as needed
-
-    # Calculate the estimated loan term in months
-    while remaining_balance > 0 and months_elapsed < max_iterations:
-        interest_payment = remaining_balance * monthly_interest_rate
-        principal_payment = monthly_payment - interest_payment - extra_payment
-        remaining_balance -= principal_payment
-        months_elapsed += 1
-
-    # Convert the number of months to years, but set a minimum of 1 year
-    estimated_loan_term_in_years = max(months_elapsed / 12, 1)
-
-    return estimated_loan_term_in_years
-
-
-
-def calculate_loan_term_difference(loan_amount, interest_rate, loan_term, extra_payment, new_interest_rate, new_loan_term, new_extra_payment):
-    # Calculate the original monthly payment and loan term
-    monthly_interest_rate = interest_rate / 12 / 100
-    num_payments = loan_term * 12
-    original_monthly_payment = loan_amount * (monthly_interest_rate * (1 + monthly_interest_rate) ** num_payments) / ((1 + monthly_interest_rate) ** num_payments - 1)
-
-    # Calculate the new monthly payment and loan term with the extra payment considered
-    new_monthly_interest_rate = new_interest_rate / 12 / 100
-    new_num_payments = new_loan_term * 12
-    if new_loan_term < loan_term:
-        new_num_payments = new_loan_term * 12
-    new_total_payment = (loan_amount * (new_monthly_interest_rate * (1 + new_monthly_interest_rate) ** new_num_payments) / ((1 + new_monthly_interest_rate) ** new_num_payments - 1) + new_extra_payment)
-
-    # Calculate the estimated loan term difference
-    estimated_loan_term_difference = calculate_loan_term(loan_amount, new_total_payment, interest_rate, loan_term, extra_payment) - loan_term
-
-    return estimated_loan_term_difference
-
-
 # Calculate loan changes and loan term difference
-results = calculate_loan_changes(loan_amount, interest_rate, loan_term, extra_payment, new_interest_rate_input, new_loan_term_input, new_extra_payment_input)
+results = calculate_loan_changes(baseline_scenario, updated_scenario)
 
 # Store the new inputs in session state
 st.session_state.new_interest_rate = new_interest_rate_input
@@ -337,103 +350,212 @@ st.markdown(
 cost = 0  # Define the threshold for considering it as a cost
 savings_or_cost = "cost" if results['payment_difference'] < cost else "savings"
 
-Updated_Loan_Term = (calculate_loan_term(loan_amount, results['new_total_payment'], interest_rate, loan_term, extra_payment)) 
+# The length of the updated schedule, in every mode; a loan without a finite
+# payment (no months to repay it in) never pays off
+Updated_Loan_Term = updated_scenario['num_payments'] / 12 if np.isfinite(results['new_total_payment']) else np.inf
 # Create the new monthly payment sentence
-new_payment_sentence = f"💡: Based on your loan changes, the new monthly payment is estimated at **R{results['new_total_payment']:,.2f}** with a {savings_or_cost} of **R{results['payment_difference']:,.2f}** and an updated loan term of **{Updated_Loan_Term:.1f} years**."
+if np.isinf(Updated_Loan_Term):
+    updated_term_text = "a loan that **never pays off**, because the new loan term is shorter than one payment"
+else:
+    updated_term_text = f"an updated loan term of **{Updated_Loan_Term:.1f} years**"
+new_payment_sentence = f"💡: Based on your loan changes, the new monthly payment is estimated at **R{results['new_total_payment']:,.2f}** with a {savings_or_cost} of **R{results['payment_difference']:,.2f}** and {updated_term_text}."
 
 # Write the sentence
 st.write(new_payment_sentence)
 
+if new_rate_changes or new_lump_sums:
+    st.write(
+        f"💡: With your {' and '.join(name for name, events in [('rate changes', new_rate_changes), ('lump sums', new_lump_sums)] if events)}, "
+        f"total interest on the updated loan is **R{updated_scenario['total_interest']:,.2f}** "
+        f"and it is paid off in **{updated_scenario['payoff_date']:%B %Y}**."
+    )
+    if daily_accrual:
+        st.caption("Rate changes and lump sums are calculated with monthly interest accrual.")
+    elif exact_cents:
+        st.caption("Rate changes and lump sums are calculated without rounding to the cent.")
+if new_rate_changes:
+    st.write("The instalment is reset at each rate change:")
+    st.dataframe(
+        updated_scenario['payment_resets'],
+        hide_index=True,
+        column_config={
+            "Month": st.column_config.NumberColumn("Payment Number"),
+            "Interest Rate": st.column_config.NumberColumn("Interest Rate", format="%.2f%%"),
+            "Monthly Payment": st.column_config.NumberColumn("Monthly Payment", format="R%,.2f"),
+        },
+    )
+
 # Display the estimated loan term difference
 #st.write("💡: Updated Loan Term: {:.2f} years".format(calculate_loan_term(loan_amount, results['new_total_payment'], interest_rate, loan_term, extra_payment)))
 
 
-# Calculate new amortization schedule
-new_amortization_schedule_df = generate_amortization_schedule(loan_amount, new_interest_rate_input, new_loan_term_input, new_extra_payment_input)
-
 #st.write("Visualize how your loan balance decreases over time with each payment.")
 
-new_monthly_interest_rate = new_interest_rate / 12 / 100
-
-# Function to calculate the balance DataFrame based on loan term difference
-def calculate_updated_balance_df(loan_amount, interest_rate, loan_term, extra_payment, new_interest_rate, new_loan_term, new_extra_payment):
-    # Calculate the original and new monthly payments
-    original_results = calculate_loan_changes(loan_amount, interest_rate, loan_term, extra_payment, new_interest_rate_input, new_loan_term_input, new_extra_payment_input)
 
-    
-    if new_loan_term == 0:
-        new_total_payment = 0
+run_timer.lap("loan_changes")
+
+# Balance series for the chart as (name, months, balances), straight from the schedule arrays
+def calculate_balance_series(original_scenario, updated_scenario):
+    return [
+        ('Original', original_scenario['schedule']['Month'].to_numpy(), original_scenario['schedule']['Remaining Balance'].to_numpy()),
+        ('Updated', updated_scenario['schedule']['Month'].to_numpy(), updated_scenario['schedule']['Remaining Balance'].to_numpy()),
+    ]
+
+
+# Balance series for the original and updated loans
+balance_series = calculate_balance_series(baseline_scenario, updated_scenario)
+run_timer.lap("chart_data")
+
+
+# WebGL line chart for the balance visualization, built from the arrays
+line_chart = balance_chart.balance_figure(balance_series, title='Original vs. Updated Loan Balance Over Time')
+run_timer.lap("figure")
+
+# Monte Carlo bands for the original loan on a prime-linked (variable) rate
+simulate_rates = st.checkbox("Simulate Variable Interest Rates")
+if simulate_rates and not baseline_scenario['num_payments']:
+    # A zero term has no months to simulate
+    st.write("Enter a loan term of at least one month to simulate variable rates.")
+elif simulate_rates:
+    simulation_columns = st.columns(3)
+    num_paths = simulation_columns[0].selectbox("Simulated Rate Paths", [1000, 10000, 100000], index=1, format_func=lambda n: f"{n:,}")
+    volatility = simulation_columns[1].number_input("Rate Volatility (% per year)", value=1.5, min_value=0.0, step=0.25)
+    reversion = simulation_columns[2].number_input("Mean Reversion Speed", value=0.5, min_value=0.0, step=0.1)
+
+    simulation = scenario_cache.cache.get_or_compute(
+        ("simulation", loan_amount, interest_rate, loan_term, extra_payment, num_paths, volatility, reversion),
+        lambda: loan_simulation.simulate_loan(
+            loan_amount, interest_rate, loan_term, extra_payment,
+            num_paths=num_paths, volatility=volatility, reversion=reversion, seed=0,
+        ),
+    )
+    loan_simulation.add_percentile_bands(line_chart, simulation)
+
+    start_date = pd.Timestamp(selected_start_year, selected_start_month, 1)
+    # Dated like the summary card's payoff date: the month after the last payment
+    payoff_dates = {p: start_date + pd.DateOffset(months=int(month)) for p, month in simulation['payoff_month'].items()}
+    # The instalment is reset over the remaining term, so without extra payments every path ends on the same date
+    if payoff_dates[5] == payoff_dates[95]:
+        payoff_text = f"The loan is paid off in {payoff_dates[50]:%B %Y} on every path, as the instalment is reset whenever the rate changes."
     else:
-        new_results = calculate_loan_changes(loan_amount, interest_rate, loan_term, extra_payment, new_interest_rate_input, new_loan_term_input, new_extra_payment_input)
+        payoff_text = f"The loan is paid off between {payoff_dates[5]:%B %Y} and {payoff_dates[95]:%B %Y} (P5-P95)."
+    st.write(
+        f"Across {num_paths:,} simulated rate paths, total interest on the original loan ranges from "
+        f"R{simulation['total_interest'][5]:,.2f} (P5) to R{simulation['total_interest'][95]:,.2f} (P95), "
+        f"with a median of R{simulation['total_interest'][50]:,.2f}. {payoff_text}"
+    )
+run_timer.lap("simulation")
 
-        new_monthly_payment = new_results['new_total_payment']
-
-        new_num_payments = new_loan_term * 12
-        # Calculate the new total payment
-        new_total_payment = (loan_amount * (new_monthly_interest_rate * (1 + new_monthly_interest_rate) ** new_num_payments) / ((1 + new_monthly_interest_rate) ** new_num_payments - 1) + new_extra_payment)
-
-    # Create DataFrames for the amortization schedules
-    original_amortization_df = generate_amortization_schedule(loan_amount, interest_rate, loan_term, extra_payment)
-    
-    if new_loan_term == 0:
-        new_amortization_df = pd.DataFrame(columns=original_amortization_df.columns)
-    else:
-        new_amortization_df = generate_amortization_schedule(loan_amount, new_interest_rate, new_loan_term, new_extra_payment)
-
-    # Create DataFrames for the balance calculations
-    original_balance_df = pd.DataFrame({
-        'Payment Number': original_amortization_df['Month'],
-        'Balance Type': 'Original',
-        'Balance Amount': original_amortization_df['Remaining Balance']
-
-    })
-
-    new_balance_df = pd.DataFrame({
-        'Payment Number': new_amortization_df['Month'],
-        'Balance Type': 'Updated',
-        'Balance Amount': new_amortization_df['Remaining Balance']
-    })
-
-    # Concatenate the DataFrames
-    combined_balance_df = pd.concat([original_balance_df, new_balance_df])
-
-    return combined_balance_df
-
-
-# Calculate the updated balance DataFrame
-updated_balance_df = calculate_updated_balance_df(loan_amount, interest_rate, loan_term, extra_payment, new_interest_rate_input, new_loan_term_input, new_extra_payment_input)
-
-
-# Create a plotly express line chart for the balance visualization
-line_chart = px.line(
-    updated_balance_df,
-    x='Payment Number',
-    y='Balance Amount',
-    color='Balance Type',
-    title='Original vs. Updated Loan Balance Over Time',
-    labels={'Balance Amount': 'Remaining Balance (R)', 'Payment Number': 'Payment Number'},
-)
-
-# Update the layout of the chart
-line_chart.update_layout(
-    xaxis_title='Number of Payments',
-    yaxis_title='Remaining Balance (R)',
-    showlegend=True,
-    legend_title_text='Balance Type',
-)
-
-line_chart.update_layout(showlegend=True,
-    yaxis_range=[0, max(updated_balance_df["Balance Amount"]) + 50000],  # Adjust the range as needed
- 
-    yaxis=dict(rangemode="tozero")  # Set y-axis to start from 0
-)
 # Display the line chart
 st.plotly_chart(line_chart, theme="streamlit")
-
+run_timer.lap("plotly_chart")
+
+# Any number of named scenarios side by side, priced together in one batch
+if st.checkbox("Compare Scenarios"):
+    st.write("Add a row for each scenario you want to compare. Identical scenarios are only calculated once.")
+    # Start from the original and updated loans; kept fixed afterwards so the user's edits survive reruns
+    if "compared_scenarios_seed" not in st.session_state:
+        st.session_state.compared_scenarios_seed = pd.DataFrame({
+            "Scenario": ["Original", "Updated"],
+            "Loan Amount (R)": [loan_amount, loan_amount],
+            "Interest Rate (%)": [interest_rate, new_interest_rate_input],
+            "Loan Term (Years)": [loan_term, new_loan_term_input],
+            "Extra Payment (R)": [extra_payment, new_extra_payment_input],
+        })
+    scenario_rows = st.data_editor(
+        st.session_state.compared_scenarios_seed,
+        num_rows="dynamic",
+        hide_index=True,
+        column_config={
+            "Loan Amount (R)": st.column_config.NumberColumn(min_value=0, step=10000, format="R%,.0f"),
+            "Interest Rate (%)": st.column_config.NumberColumn(min_value=0.0, max_value=100.0, step=0.25, format="%.2f"),
+            "Loan Term (Years)": st.column_config.NumberColumn(min_value=1, max_value=50, step=1),
+            "Extra Payment (R)": st.column_config.NumberColumn(min_value=0, step=100, format="R%,.0f"),
+        },
+        key="compared_scenarios",
+    )
+    scenario_rows = scenario_rows.dropna(subset=["Loan Amount (R)", "Interest Rate (%)", "Loan Term (Years)"]).fillna({"Extra Payment (R)": 0})
+    scenario_names = [
+        name if isinstance(name, str) and name else f"Scenario {number}"
+        for number, name in enumerate(scenario_rows["Scenario"], start=1)
+    ]
+    compared_scenarios = scenario_cache.loan_scenarios(
+        list(scenario_rows[["Loan Amount (R)", "Interest Rate (%)", "Loan Term (Years)", "Extra Payment (R)"]].itertuples(index=False, name=None)),
+        selected_start_year,
+        selected_start_month,
+    )
+
+    st.dataframe(
+        pd.DataFrame({
+            "Scenario": scenario_names,
+            "Monthly Payment": [scenario['total_payment'] for scenario in compared_scenarios],
+            "Total Interest": [scenario['total_interest'] for scenario in compared_scenarios],
+            "Payments": [scenario['num_payments'] for scenario in compared_scenarios],
+            "Payoff Date": [scenario['payoff_date'] for scenario in compared_scenarios],
+        }),
+        hide_index=True,
+        column_config={
+            "Monthly Payment": st.column_config.NumberColumn(format="R%,.2f"),
+            "Total Interest": st.column_config.NumberColumn(format="R%,.2f"),
+            "Payoff Date": st.column_config.DateColumn(format="MMM YYYY"),
+        },
+    )
+    comparison_series = [
+        (name, scenario['schedule']['Month'].to_numpy(), scenario['schedule']['Remaining Balance'].to_numpy())
+        for name, scenario in zip(scenario_names, compared_scenarios)
+    ]
+    st.plotly_chart(balance_chart.balance_figure(comparison_series, title='Loan Balance by Scenario', legend_title='Scenario'), theme="streamlit")
+run_timer.lap("comparison")
+
+# Sensitivity analysis over a grid of rates, terms and extra payments
+if st.checkbox("Show Sensitivity Analysis"):
+    st.write("Explore how the interest rate, loan term and an extra monthly payment change the cost of your loan.")
+    default_rate_range = (min(max(interest_rate - 5, 0.0), 30.0), min(interest_rate + 5, 30.0))
+    rate_range = st.slider("Interest Rate Range (%)", 0.0, 30.0, default_rate_range, step=0.25)
+    term_range = st.slider("Loan Term Range (Years)", 1, 40, (5, 30))
+    max_extra_payment = st.number_input("Largest Extra Monthly Payment (R)", value=10000, step=500)
+
+    # 100 rates x up to 40 terms x 20 extra payments, evaluated in one array pass
+    sensitivity = loan_sensitivity.sensitivity_grid(
+        loan_amount,
+        np.linspace(rate_range[0], rate_range[1], 100),
+        np.arange(term_range[0], term_range[1] + 1),
+        np.linspace(0, max_extra_payment, 20),
+    )
+    extra_index = st.select_slider(
+        "Extra Monthly Payment (R)",
+        options=range(len(sensitivity['extra_payments'])),
+        format_func=lambda i: f"R{sensitivity['extra_payments'][i]:,.0f}",
+    )
+    metric = st.radio(
+        "Show",
+        list(loan_sensitivity.HEATMAP_METRICS),
+        format_func=lambda key: loan_sensitivity.HEATMAP_METRICS[key][0],
+        horizontal=True,
+    )
+    st.plotly_chart(loan_sensitivity.sensitivity_heatmap(sensitivity, metric, extra_index), theme="streamlit")
+
+run_timer.lap("sensitivity")
+
+# Largest loan for each monthly budget and term at the current rate, in one array pass
+if st.checkbox("Show Affordability Table"):
+    budget_range = st.slider("Monthly Budget Range (R)", 1000, 100000, (5000, 50000), step=1000)
+    budgets = np.arange(budget_range[0], budget_range[1] + 1, 1000)
+    affordability_terms = [10, 15, 20, 25, 30]
+    max_loans = loan_engine.max_loan_amount(budgets[:, None], interest_rate, np.array(affordability_terms)[None, :])
+    affordability_table = pd.DataFrame(max_loans, columns=[f"{term} years" for term in affordability_terms])
+    affordability_table.insert(0, "Monthly Budget", budgets)
+    st.write(f"The most you can borrow at {interest_rate}% for each monthly budget and loan term:")
+    st.dataframe(
+        affordability_table,
+        hide_index=True,
+        column_config={column: st.column_config.NumberColumn(column, format="R%,.0f") for column in affordability_table.columns},
+    )
+run_timer.lap("affordability")
 
 st.markdown("---")
 
-st.markdown("**Disclaimer:** This calculator provides rough estimates of loan payments. It assumes a fixed interest rate for the entire loan term and does not consider other factors like taxes, insurance, or variable interest rates. The results may not be accurate, and you should consult with a financial advisor or lender for precise loan information.")
+st.markdown("**Disclaimer:** This calculator provides rough estimates of loan payments. It assumes a fixed interest rate for the entire loan term (the variable-rate simulation is illustrative only) and does not consider other factors like taxes or insurance. The results may not be accurate, and you should consult with a financial advisor or lender for precise loan information.")
 
 # Adding a footer
 footer = """
@@ -461,3 +583,7 @@ footer = """
     </div>
 """
 st.markdown(footer, unsafe_allow_html=True)
+run_timer.lap("footer")
+
+# Log this rerun's stage timings and show the debug panel
+run_timer.finish()
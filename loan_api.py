@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Headless JSON quoting service over the loan engine.
+
+Serves the same numbers as the Streamlit page without a browser session:
+
+    GET  /health
+    POST /quote    one scenario
+    POST /quotes   {"scenarios": [...]} priced together in one array pass
+
+A scenario is a JSON object with loan_amount, interest_rate (annual %) and
+loan_term (years, one month to 50 years), plus optional extra_payment (R per month), start_date
+("YYYY-MM", first payment month) and include_balance (add the month-by-month
+remaining balance, as plotted on the page).
+
+Requests are handled on a thread per connection, and quotes are kept in an
+LRU/TTL response cache shared by all requests.
+
+    python loan_api.py --host 0.0.0.0 --port 8080
+"""
+import argparse
+import json
+import math
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+import loan_engine
+import scenario_cache
+
+MAX_BATCH_SIZE = int(os.environ.get("LOAN_API_MAX_BATCH", 10000))
+MAX_BODY_BYTES = int(os.environ.get("LOAN_API_MAX_BODY_BYTES", 10 * 1024 * 1024))
+
+# Longest term the apps accept (600 months); also bounds the rows of a balance series
+MAX_LOAN_TERM = 50
+# Highest annual rate (%) accepted, as on the page; far below where the annuity
+# factor overflows
+MAX_INTEREST_RATE = 100
+
+# Priced quotes shared by every request in this process
+quote_cache = scenario_cache.ScenarioCache(
+    max_entries=int(os.environ.get("LOAN_API_CACHE_MAX_ENTRIES", 100000)),
+    ttl=float(os.environ.get("LOAN_API_CACHE_TTL_SECONDS", 3600)),
+)
+
+
+class QuoteError(ValueError):
+    # A scenario that cannot be priced; reported to the caller as HTTP 400
+    pass
+
+
+def _number(scenario, field, default=None):
+    value = scenario.get(field, default)
+    if value is None:
+        raise QuoteError(f"'{field}' is required")
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise QuoteError(f"'{field}' must be a finite number")
+    return float(value)
+
+
+# Validate one scenario and return its cache key
+def _scenario_key(scenario):
+    if not isinstance(scenario, dict):
+        raise QuoteError("each scenario must be a JSON object")
+    loan_amount = _number(scenario, "loan_amount")
+    interest_rate = _number(scenario, "interest_rate")
+    loan_term = _number(scenario, "loan_term")
+    extra_payment = _number(scenario, "extra_payment", 0)
+    if loan_amount < 0 or interest_rate < 0 or extra_payment < 0:
+        raise QuoteError("loan_amount, interest_rate and extra_payment must be >= 0")
+    # A term under one month rounds to no payments at all
+    if loan_term * 12 < 1:
+        raise QuoteError("loan_term must be at least one month (1/12 of a year)")
+    if interest_rate > MAX_INTEREST_RATE or loan_term > MAX_LOAN_TERM:
+        raise QuoteError(f"interest_rate must be at most {MAX_INTEREST_RATE} and loan_term at most {MAX_LOAN_TERM} years")
+
+    start_date = scenario.get("start_date")
+    if start_date is not None:
+        # pd.Timestamp would also read a bare number, as nanoseconds since 1970
+        if not isinstance(start_date, str):
+            raise QuoteError("'start_date' must be a date such as '2023-01'")
+        try:
+            start_date = pd.Timestamp(start_date).strftime("%Y-%m")
+        except (TypeError, ValueError):
+            raise QuoteError("'start_date' must be a date such as '2023-01'") from None
+    return (loan_amount, interest_rate, loan_term, extra_payment, start_date)
+
+
+def _finite_or_none(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def _quote(key, summary, index):
+    loan_amount, interest_rate, loan_term, extra_payment, start_date = key
+    num_payments = float(summary["num_payments"][index])
+    never_amortizes = not math.isfinite(num_payments)
+
+    payoff_date = None
+    if start_date is not None and not never_amortizes:
+        payoff_date = (pd.Timestamp(start_date) + pd.DateOffset(months=int(num_payments))).strftime("%Y-%m")
+
+    return {
+        "loan_amount": loan_amount,
+        "interest_rate": interest_rate,
+        "loan_term": loan_term,
+        "extra_payment": extra_payment,
+        "start_date": start_date,
+        "monthly_payment": _finite_or_none(summary["monthly_payment"][index]),
+        "total_payment": _finite_or_none(summary["total_payment"][index]),
+        "total_interest": _finite_or_none(summary["total_interest"][index]),
+        "num_payments": None if never_amortizes else int(num_payments),
+        "term_years": None if never_amortizes else num_payments / 12,
+        "never_amortizes": never_amortizes,
+        "payoff_date": payoff_date,
+    }
+
+
+# Price a list of scenario dicts. Cache misses are priced together in one array pass.
+def quote_scenarios(scenarios):
+    if not isinstance(scenarios, list):
+        raise QuoteError("'scenarios' must be a list")
+    if len(scenarios) > MAX_BATCH_SIZE:
+        raise QuoteError(f"at most {MAX_BATCH_SIZE} scenarios per request")
+
+    keys = []
+    for position, scenario in enumerate(scenarios):
+        try:
+            keys.append(_scenario_key(scenario))
+        except QuoteError as e:
+            raise QuoteError(f"scenario {position}: {e}") from None
+
+    quotes = [quote_cache.get(key) for key in keys]
+    missing = list(dict.fromkeys(key for key, quote in zip(keys, quotes) if quote is None))
+    if missing:
+        columns = np.array([key[:4] for key in missing], dtype=float).T
+        summary = {name: np.atleast_1d(values) for name, values in loan_engine.loan_summary(*columns).items()}
+        priced = {key: _quote(key, summary, index) for index, key in enumerate(missing)}
+        for key, quote in priced.items():
+            quote_cache.put(key, quote)
+        quotes = [quote if quote is not None else priced[key] for key, quote in zip(keys, quotes)]
+
+    # Balance series as drawn on the balance chart, priced together through the scenario cache
+    with_balance = [position for position, scenario in enumerate(scenarios) if scenario.get("include_balance")]
+    if with_balance:
+        schedules = scenario_cache.loan_scenarios([keys[position][:4] for position in with_balance])
+        for position, scenario in zip(with_balance, schedules):
+            quotes[position] = dict(quotes[position], balance=scenario["schedule"]["Remaining Balance"].round(2).tolist())
+    return quotes
+
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    server_version = "HomeLoanQuotes/1.0"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise QuoteError("invalid Content-Length") from None
+        if length < 0:
+            raise QuoteError("invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise QuoteError("request body too large")
+        try:
+            return json.loads(self.rfile.read(length) or b"null")
+        except ValueError:
+            raise QuoteError("request body must be valid JSON") from None
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "cache": quote_cache.stats()})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            if self.path == "/quote":
+                self._send_json(200, quote_scenarios([self._read_json()])[0])
+            elif self.path == "/quotes":
+                payload = self._read_json()
+                if not isinstance(payload, dict):
+                    raise QuoteError("body must be an object with a 'scenarios' list")
+                self._send_json(200, {"quotes": quote_scenarios(payload.get("scenarios"))})
+            else:
+                self._send_json(404, {"error": "not found"})
+        except QuoteError as e:
+            self._send_json(400, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        if os.environ.get("LOAN_API_ACCESS_LOG"):
+            super().log_message(format, *args)
+
+
+def serve(host="127.0.0.1", port=8080):
+    server = ThreadingHTTPServer((host, port), QuoteHandler)
+    server.daemon_threads = True
+    print(f"Serving loan quotes on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve home loan quotes over HTTP/JSON.")
+    parser.add_argument("--host", default=os.environ.get("LOAN_API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("LOAN_API_PORT", 8080)))
+    args = parser.parse_args(argv)
+    serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Batch portfolio pricing: the calculator's numbers for a whole book of loans.
+
+Input is a CSV or Parquet file with one loan per row:
+
+    loan_amount, interest_rate (annual %), loan_term (years)
+    extra_payment (optional, R per month, default 0)
+    start_date (optional, first payment month, e.g. 2023-01)
+
+Any other columns (loan IDs etc.) are passed through unchanged. Each chunk
+of rows is priced with array operations over the whole chunk and written out
+before the next one is read, so memory stays flat as the book grows.
+
+    python loan_batch.py loans.csv priced.parquet --chunksize 50000
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import loan_engine
+
+REQUIRED_COLUMNS = ['loan_amount', 'interest_rate', 'loan_term']
+DEFAULT_CHUNKSIZE = 50000
+
+# Rows per worksheet in an .xlsx file (Excel's limit, including the header)
+XLSX_MAX_ROWS = 1048575
+
+
+def _is_parquet(path):
+    return os.path.splitext(str(path))[1].lower() in ('.parquet', '.pq')
+
+
+# 'csv', 'parquet' or 'xlsx' from a file name
+def file_format(path):
+    if _is_parquet(path):
+        return 'parquet'
+    return 'xlsx' if os.path.splitext(str(path))[1].lower() == '.xlsx' else 'csv'
+
+
+# Yield DataFrame chunks of at most chunksize rows from a CSV or Parquet file
+def read_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+class ChunkWriter:
+    # Appends DataFrame chunks to a CSV, Parquet or Excel file as they are produced.
+    # path may also be a binary file object, with the format given explicitly.
+    # Excel output needs openpyxl; rows are streamed to a write-only workbook and
+    # continue on a new sheet when one is full.
+
+    def __init__(self, path, format=None):
+        self.path = path
+        self.format = format or file_format(path)
+        self.rows = 0
+        self._parquet_writer = None
+        self._workbook = None
+        self._sheet_rows = 0
+
+    def write(self, df):
+        if self.format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._parquet_writer is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=self._parquet_writer.schema, preserve_index=False)
+            self._parquet_writer.write_table(table)
+        elif self.format == 'xlsx':
+            self._write_xlsx(df)
+        else:
+            df.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        self.rows += len(df)
+
+    def _write_xlsx(self, df):
+        if self._workbook is None:
+            try:
+                from openpyxl import Workbook
+            except ImportError:
+                raise ValueError("Excel output requires the openpyxl package") from None
+            self._workbook = Workbook(write_only=True)
+        for row in df.itertuples(index=False, name=None):
+            if self._sheet_rows == 0 or self._sheet_rows >= XLSX_MAX_ROWS:
+                sheet = self._workbook.create_sheet(f"Sheet{len(self._workbook.worksheets) + 1}")
+                sheet.append(list(df.columns))
+                self._sheet_rows = 0
+            self._workbook.worksheets[-1].append(row)
+            self._sheet_rows += 1
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self._workbook is not None:
+            if not self._workbook.worksheets:
+                self._workbook.create_sheet("Sheet1")
+            self._workbook.save(self.path)
+            self._workbook = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Price every loan in a DataFrame in one vectorised pass
+def price_loans(loans):
+    missing = [column for column in REQUIRED_COLUMNS if column not in loans.columns]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+
+    extra_payment = loans['extra_payment'].fillna(0).to_numpy(dtype=float) if 'extra_payment' in loans else 0.0
+    summary = loan_engine.loan_summary(
+        loans['loan_amount'].to_numpy(dtype=float),
+        loans['interest_rate'].to_numpy(dtype=float),
+        loans['loan_term'].to_numpy(dtype=float),
+        extra_payment,
+    )
+    num_payments = np.broadcast_to(summary['num_payments'], len(loans))
+
+    priced = loans.copy()
+    priced['monthly_payment'] = summary['monthly_payment']
+    priced['total_payment'] = summary['total_payment']
+    priced['total_interest'] = summary['total_interest']
+    priced['num_payments'] = num_payments
+    priced['updated_term_years'] = num_payments / 12
+
+    # Payoff date is the month after the last payment, like the summary card
+    if 'start_date' in loans:
+        start = pd.to_datetime(loans['start_date']).to_numpy().astype('datetime64[M]')
+        paid_off = np.isfinite(num_payments)
+        offset = np.where(paid_off, num_payments, 0).astype(np.int64).astype('timedelta64[M]')
+        payoff = (start + offset).astype('datetime64[ns]')
+        priced['payoff_date'] = np.where(paid_off, payoff, np.datetime64('NaT'))
+
+    return priced
+
+
+# Price a CSV/Parquet portfolio chunk by chunk, yielding the priced chunks
+def iter_priced(source, chunksize=DEFAULT_CHUNKSIZE):
+    for chunk in read_chunks(source, chunksize):
+        yield price_loans(chunk)
+
+
+# Price a portfolio file into destination (CSV, Parquet or Excel). Returns the row count.
+def price_portfolio(source, destination, chunksize=DEFAULT_CHUNKSIZE):
+    with ChunkWriter(destination) as writer:
+        for priced in iter_priced(source, chunksize):
+            writer.write(priced)
+    return writer.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price a portfolio of home loans from a CSV or Parquet file.")
+    parser.add_argument("source", help="input loans (.csv or .parquet)")
+    parser.add_argument("destination", help="output file (.csv, .parquet or .xlsx)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="loans per chunk (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    try:
+        rows = price_portfolio(args.source, args.destination, args.chunksize)
+    except ValueError as e:
+        parser.exit(2, f"error: {e}\n")
+    print(f"Priced {rows:,} loans -> {args.destination}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,554 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorised loan calculations shared by the Streamlit apps.
+
+Every function takes scalars or NumPy arrays and broadcasts like a NumPy
+ufunc. Rates are annual percentages and terms are in years, the same units
+as the sidebar inputs.
+
+pandas is only imported by the functions that return DataFrames, so the
+array functions load without it and the apps can draw the loan summary
+before pandas is loaded.
+"""
+import math
+
+import numpy as np
+
+# Column order of the schedules returned by amortization_schedule
+SCHEDULE_COLUMNS = ['Month', 'Monthly Payment', 'Principal Payment', 'Interest Payment', 'Remaining Balance']
+
+# Balances below this are treated as fully paid off (floating point residue)
+BALANCE_TOLERANCE = 1e-6
+
+# Loans per block in the cent-exact scan; bounds its (loans x months) work arrays
+CENT_CHUNK_LOANS = 10000
+
+# Grid of the annuity-factor table: annual rates in whole basis points up to 30%
+# and terms in whole months up to 50 years (the longest term the apps accept)
+ANNUITY_TABLE_MAX_RATE_BP = 3000
+ANNUITY_TABLE_MAX_MONTHS = 600
+
+# One row of factors per rate, filled the first time that rate is priced. The
+# table is allocated but not written up front, so only the rows in use take
+# memory (4.8 KB each, 14 MB if every rate were used).
+_annuity_table = np.empty((ANNUITY_TABLE_MAX_RATE_BP + 1, ANNUITY_TABLE_MAX_MONTHS + 1))
+_annuity_rows = np.zeros(ANNUITY_TABLE_MAX_RATE_BP + 1, dtype=bool)
+
+
+# Return a plain Python/NumPy scalar for 0-d results so f-string formatting works
+def _squeeze(value):
+    return value[()] if np.ndim(value) == 0 else value
+
+
+# Convert an annual percentage rate to a monthly decimal rate
+def monthly_rate(interest_rate):
+    return np.asarray(interest_rate, dtype=float) / 12 / 100
+
+
+# Monthly payment per R1 borrowed over num_payments months (1/n at a 0% rate)
+def annuity_factor(rate, num_payments):
+    rate = np.asarray(rate, dtype=float)
+    num_payments = np.asarray(num_payments, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        growth = np.exp(num_payments * np.log1p(rate))
+        factor = np.where(rate == 0, 1 / num_payments, rate * growth / (growth - 1))
+    return _squeeze(factor)
+
+
+# Table row of one rate (in basis points), filled on first use. Concurrent fills
+# write the same values and the row is only marked once written, so no lock is
+# needed.
+def _annuity_row(rate_bp):
+    if not _annuity_rows[rate_bp]:
+        _annuity_table[rate_bp] = annuity_factor(monthly_rate(rate_bp / 100), np.arange(ANNUITY_TABLE_MAX_MONTHS + 1))
+        _annuity_rows[rate_bp] = True
+    return _annuity_table[rate_bp]
+
+
+# annuity_factor for annual rates (%) and terms of num_payments months, exactly
+# annuity_factor(monthly_rate(interest_rate), num_payments). A single rate in
+# whole basis points with a whole-month term on the table's grid is looked up
+# instead of computed. Arrays always use the closed form: numpy evaluates it
+# about as fast as it could check the inputs are on the grid and gather them.
+def payment_factor(interest_rate, num_payments):
+    if np.ndim(interest_rate) == 0 and np.ndim(num_payments) == 0:
+        rate, months = float(interest_rate), float(num_payments)
+        if math.isfinite(rate) and months.is_integer() and 1 <= months <= ANNUITY_TABLE_MAX_MONTHS:
+            rate_bp = round(rate * 100)
+            if rate_bp / 100 == rate and 0 <= rate_bp <= ANNUITY_TABLE_MAX_RATE_BP:
+                return _annuity_row(rate_bp)[int(months)]
+    return annuity_factor(monthly_rate(interest_rate), num_payments)
+
+
+# Level monthly payment that pays off loan_amount over loan_term years
+def monthly_payment(loan_amount, interest_rate, loan_term):
+    num_payments = np.asarray(loan_term, dtype=float) * 12
+    return _squeeze(np.asarray(loan_amount, dtype=float) * payment_factor(interest_rate, num_payments))
+
+
+# Largest loan that a monthly payment repays over loan_term years (the payment
+# formula solved for the principal)
+def max_loan_amount(payment, interest_rate, loan_term):
+    num_payments = np.asarray(loan_term, dtype=float) * 12
+    return _squeeze(np.asarray(payment, dtype=float) / payment_factor(interest_rate, num_payments))
+
+
+# Annual rate (%) at which `payment` repays loan_amount over loan_term years, for
+# arrays of quotes at once. The payment rises with the rate, so the root is
+# bracketed between 0% and the interest-only rate payment / loan_amount and
+# found with Newton steps, falling back to bisection when a step leaves the
+# bracket. NaN where no non-negative rate fits (the payment is below
+# loan_amount / number of payments, or not positive). tolerance is on the
+# monthly rate as a decimal.
+def implied_rate(loan_amount, payment, loan_term, tolerance=1e-12, max_iterations=100):
+    loan_amount, payment, num_payments = np.broadcast_arrays(
+        np.asarray(loan_amount, dtype=float),
+        np.asarray(payment, dtype=float),
+        np.asarray(loan_term, dtype=float) * 12,
+    )
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        solvable = (loan_amount > 0) & (payment > 0) & (num_payments > 0) & (payment * num_payments >= loan_amount)
+        low = np.zeros(loan_amount.shape)
+        high = np.where(solvable, payment / loan_amount, 0.0)
+        rate = high / 2
+
+        for _ in range(max_iterations):
+            growth = np.exp(num_payments * np.log1p(rate))
+            excess = loan_amount * annuity_factor(rate, num_payments) - payment
+            low = np.where(excess < 0, rate, low)
+            high = np.where(excess > 0, rate, high)
+
+            slope = loan_amount * (growth / (growth - 1) - rate * num_payments * growth / ((1 + rate) * (growth - 1) ** 2))
+            newton = rate - excess / slope
+            in_bracket = np.isfinite(newton) & (newton > low) & (newton < high)
+            next_rate = np.where(in_bracket, newton, (low + high) / 2)
+            converged = (np.abs(next_rate - rate) <= tolerance) | (high - low <= tolerance)
+            rate = next_rate
+            if np.all(converged | ~solvable):
+                break
+
+    return _squeeze(np.where(solvable, rate * 12 * 100, np.nan))
+
+
+# Closed-form balance left after `months` payments of `payment` at monthly rate `rate`
+def remaining_balance(loan_amount, rate, payment, months):
+    rate = np.asarray(rate, dtype=float)
+    months = np.asarray(months, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        growth = np.exp(months * np.log1p(rate))
+        balance = np.where(
+            rate == 0,
+            loan_amount - payment * months,
+            loan_amount * growth - payment * np.expm1(months * np.log1p(rate)) / rate,
+        )
+    return _squeeze(balance)
+
+
+# Month-by-month schedules for any number of loans in one array pass, as flat
+# arrays with one row per loan-month. A schedule stops early (with a smaller final
+# payment) when an extra payment clears the balance before the term ends.
+def amortization_arrays(loan_amount, interest_rate, loan_term, extra_payment=0):
+    loan_amount, interest_rate, loan_term, extra_payment = (
+        np.atleast_1d(np.asarray(value, dtype=float))
+        for value in np.broadcast_arrays(loan_amount, interest_rate, loan_term, extra_payment)
+    )
+    rate = monthly_rate(interest_rate)
+    term_months = np.round(loan_term * 12)
+    payment = np.atleast_1d(monthly_payment(loan_amount, interest_rate, loan_term)) + extra_payment
+
+    payoff = payoff_months(loan_amount, interest_rate, payment)
+    paid_off = payoff <= term_months
+    months_per_loan = np.where(paid_off, payoff, term_months).astype(np.int64)
+
+    # Row i belongs to loan loan_index[i] and is that loan's payment number month[i]
+    loan_index = np.repeat(np.arange(loan_amount.size), months_per_loan)
+    first_rows = np.cumsum(months_per_loan) - months_per_loan
+    month = np.arange(loan_index.size) - first_rows[loan_index] + 1
+
+    balance = remaining_balance(loan_amount[loan_index], rate[loan_index], payment[loan_index], month)
+    balance = np.where(balance < BALANCE_TOLERANCE, 0.0, np.atleast_1d(balance))
+    balance[(month == months_per_loan[loan_index]) & paid_off[loan_index]] = 0.0
+
+    # Opening balance is the previous row's closing balance within the same loan
+    opening = np.empty_like(balance)
+    opening[1:] = balance[:-1]
+    first_month = month == 1
+    opening[first_month] = loan_amount[loan_index[first_month]]
+
+    interest = opening * rate[loan_index]
+    principal = opening - balance
+
+    return {
+        'loan_index': loan_index,
+        'month': month,
+        'payment': principal + interest,
+        'principal': principal,
+        'interest': interest,
+        'balance': balance,
+    }
+
+
+# Full amortization schedule for one loan
+def amortization_schedule(loan_amount, interest_rate, loan_term, extra_payment=0):
+    import pandas as pd
+
+    arrays = amortization_arrays(loan_amount, interest_rate, loan_term, extra_payment)
+    return pd.DataFrame({
+        'Month': arrays['month'],
+        'Monthly Payment': arrays['payment'],
+        'Principal Payment': arrays['principal'],
+        'Interest Payment': arrays['interest'],
+        'Remaining Balance': arrays['balance'],
+    }, columns=SCHEDULE_COLUMNS)
+
+
+# Round rand amounts (or cent-valued floats) half up to whole cents as int64.
+# Raises ValueError for amounts int64 cannot hold (inf, NaN or too large), which
+# the cast would otherwise turn into garbage.
+def to_cents(amount, already_cents=False):
+    cents = np.asarray(amount, dtype=float) * (1 if already_cents else 100)
+    if not np.all(np.abs(cents) < 2.0 ** 63):
+        raise ValueError("amount cannot be held in int64 cents")
+    return np.floor(cents + 0.5).astype(np.int64)
+
+
+# Cent-exact schedules for one block of loans. Balances are int64 cents; each
+# month's interest is rounded to the cent and the instalment is the quoted
+# payment rounded to the cent, as on a bank statement. The last payment settles
+# whatever is left: early when an extra payment clears the loan, otherwise at the
+# end of the term (absorbing the rounding residue). Months are scanned in order,
+# with every loan in the block advanced together.
+def _cent_block(loan_amount, rate, term_months, payment):
+    num_loans = loan_amount.size
+    if num_loans == 1:
+        return _cent_single(int(loan_amount[0]), float(rate[0]), int(term_months[0]), int(payment[0]))
+    max_months = int(term_months.max(initial=0))
+    shape = (num_loans, max_months)
+    paid = np.zeros(shape, dtype=np.int64)
+    interest_paid = np.zeros(shape, dtype=np.int64)
+    balances = np.zeros(shape, dtype=np.int64)
+    active = np.zeros(shape, dtype=bool)
+
+    balance = loan_amount.copy()
+    for month in range(max_months):
+        running = (balance > 0) & (month < term_months)
+        interest = to_cents(balance * rate, already_cents=True)
+        final = (balance + interest <= payment) | (month == term_months - 1)
+        amount = np.where(final, balance + interest, payment)
+        closing = np.where(final, 0, balance + interest - payment)
+
+        paid[:, month] = amount
+        interest_paid[:, month] = interest
+        balances[:, month] = closing
+        active[:, month] = running
+        balance = np.where(running, closing, balance)
+
+    # Row-major masking keeps each loan's months together and in order
+    loan_index, month_index = np.nonzero(active)
+    return loan_index, month_index + 1, paid[active], interest_paid[active], balances[active]
+
+
+# The same scan for a single loan on Python ints, which beats per-month array
+# calls when there is only one row to advance
+def _cent_single(balance, rate, term_months, payment):
+    paid, interest_paid, balances = [], [], []
+    for month in range(term_months):
+        if balance <= 0:
+            break
+        interest = math.floor(balance * rate + 0.5)
+        if balance + interest <= payment or month == term_months - 1:
+            amount, balance = balance + interest, 0
+        else:
+            amount, balance = payment, balance + interest - payment
+        paid.append(amount)
+        interest_paid.append(interest)
+        balances.append(balance)
+
+    num_months = len(paid)
+    return (
+        np.zeros(num_months, dtype=np.int64),
+        np.arange(1, num_months + 1),
+        np.array(paid, dtype=np.int64),
+        np.array(interest_paid, dtype=np.int64),
+        np.array(balances, dtype=np.int64),
+    )
+
+
+# Cent-exact counterpart of amortization_arrays: the same flat layout, with every
+# amount in int64 cents, so the rows add up exactly to the totals and the final
+# balance is exactly zero. Loans are processed in blocks of chunk_loans. Loans
+# without a finite instalment (a term under one month, or a payment that
+# overflows) get no rows, as in amortization_arrays.
+def cent_amortization_arrays(loan_amount, interest_rate, loan_term, extra_payment=0, chunk_loans=CENT_CHUNK_LOANS):
+    loan_amount, interest_rate, loan_term, extra_payment = (
+        np.atleast_1d(np.asarray(value, dtype=float))
+        for value in np.broadcast_arrays(loan_amount, interest_rate, loan_term, extra_payment)
+    )
+    principal_cents = to_cents(loan_amount)
+    rate = monthly_rate(interest_rate)
+    term_months = np.round(loan_term * 12)
+    payment = np.atleast_1d(monthly_payment(loan_amount, interest_rate, loan_term))
+    # Only loans with a finite instalment reach the int64 scan
+    schedulable = (term_months >= 1) & np.isfinite(payment)
+    term_months = np.where(schedulable, term_months, 0).astype(np.int64)
+    payment = to_cents(np.where(schedulable, payment, 0.0)) + to_cents(extra_payment)
+
+    blocks = []
+    for start in range(0, loan_amount.size, chunk_loans):
+        block = slice(start, start + chunk_loans)
+        loan_index, month, paid, interest, balance = _cent_block(principal_cents[block], rate[block], term_months[block], payment[block])
+        blocks.append((loan_index + start, month, paid, interest, balance))
+
+    loan_index, month, paid, interest, balance = (np.concatenate(parts) for parts in zip(*blocks))
+    return {
+        'loan_index': loan_index,
+        'month': month,
+        'payment': paid,
+        'principal': paid - interest,
+        'interest': interest,
+        'balance': balance,
+    }
+
+
+# Cent-exact schedule for one loan, in rands (every amount a whole number of cents)
+def cent_amortization_schedule(loan_amount, interest_rate, loan_term, extra_payment=0):
+    import pandas as pd
+
+    arrays = cent_amortization_arrays(loan_amount, interest_rate, loan_term, extra_payment)
+    return pd.DataFrame({
+        'Month': arrays['month'],
+        'Monthly Payment': arrays['payment'] / 100,
+        'Principal Payment': arrays['principal'] / 100,
+        'Interest Payment': arrays['interest'] / 100,
+        'Remaining Balance': arrays['balance'] / 100,
+    }, columns=SCHEDULE_COLUMNS)
+
+
+# One fixed-rate stretch of a schedule in closed form from its opening balance:
+# up to num_months payments of `payment`, numbered from first_month. Stops early
+# (with a smaller final payment) if the balance is cleared within the stretch.
+def _segment_arrays(opening_balance, interest_rate, payment, first_month, num_months):
+    rate = monthly_rate(interest_rate)
+    payoff = payoff_months(opening_balance, interest_rate, payment)
+    months = np.arange(1, int(min(payoff, num_months)) + 1)
+
+    balance = np.atleast_1d(remaining_balance(opening_balance, rate, payment, months)).astype(float)
+    balance[balance < BALANCE_TOLERANCE] = 0.0
+    if payoff <= num_months and months.size:
+        balance[-1] = 0.0
+
+    opening = np.concatenate(([opening_balance], balance[:-1]))
+    interest = opening * rate
+    principal = opening - balance
+    return {
+        'month': months + first_month - 1,
+        'payment': principal + interest,
+        'principal': principal,
+        'interest': interest,
+        'balance': balance,
+    }
+
+
+def _schedule_frame(segments):
+    import pandas as pd
+
+    return pd.DataFrame({
+        'Month': np.concatenate([segment['month'] for segment in segments]),
+        'Monthly Payment': np.concatenate([segment['payment'] for segment in segments]),
+        'Principal Payment': np.concatenate([segment['principal'] for segment in segments]),
+        'Interest Payment': np.concatenate([segment['interest'] for segment in segments]),
+        'Remaining Balance': np.concatenate([segment['balance'] for segment in segments]),
+    }, columns=SCHEDULE_COLUMNS)
+
+
+# Schedule for one loan with rate changes and one-off lump-sum payments.
+# rate_changes maps a payment number to the annual rate that applies from that
+# payment on; at each change the instalment is reset to repay the balance over
+# the remaining term, plus any extra payment. lump_sums maps a payment number
+# to an amount paid with that payment; the instalment stays the same, so the
+# loan finishes sooner. Every stretch between events is computed in closed form
+# from its opening balance, so the cost grows with the number of events, not
+# the number of months.
+#
+# segment_cache (anything with get_or_compute, e.g. a ScenarioCache) memoises
+# stretches by their inputs. Editing an event only changes the stretches from
+# that month on, so everything before it is served from the cache.
+# Returns the schedule and one row per payment reset.
+def event_schedule(loan_amount, interest_rate, loan_term, rate_changes=None, lump_sums=None, extra_payment=0, segment_cache=None):
+    import pandas as pd
+
+    term_months = int(round(loan_term * 12))
+    rates = {1: float(interest_rate)}
+    rates.update((int(month), float(rate)) for month, rate in dict(rate_changes or {}).items() if 1 <= int(month) <= term_months)
+    lumps = {int(month): float(amount) for month, amount in dict(lump_sums or {}).items() if 1 <= int(month) <= term_months and amount > 0}
+    starts = sorted(set(rates) | {month + 1 for month in lumps if month < term_months})
+
+    balance = float(loan_amount)
+    segments, resets = [], []
+    for start, end in zip(starts, starts[1:] + [term_months + 1]):
+        if start in rates:
+            rate = rates[start]
+            payment = balance * payment_factor(rate, term_months - start + 1) + extra_payment
+            resets.append((start, rate, payment))
+        inputs = (balance, rate, payment, start, end - start)
+        if segment_cache is None:
+            segment = _segment_arrays(*inputs)
+        else:
+            segment = segment_cache.get_or_compute(('segment',) + inputs, lambda: _segment_arrays(*inputs))
+        if segment['balance'].size < end - start or segment['balance'][-1] == 0:
+            segments.append(segment)
+            break
+
+        balance = segment['balance'][-1]
+        lump = min(lumps.get(end - 1, 0.0), balance)
+        if lump:
+            # Add the lump sum to the last payment of the stretch (cached arrays are copied, not changed)
+            segment = {name: values.copy() for name, values in segment.items()}
+            balance = 0.0 if balance - lump < BALANCE_TOLERANCE else balance - lump
+            for name in ('payment', 'principal'):
+                segment[name][-1] += lump
+            segment['balance'][-1] = balance
+        segments.append(segment)
+        if balance == 0:
+            break
+
+    return _schedule_frame(segments), pd.DataFrame(resets, columns=['Month', 'Interest Rate', 'Monthly Payment'])
+
+
+# Interest per R1 of balance for each payment month when interest accrues daily
+# on actual calendar days. day_count is the days-per-year divisor (365, as SA
+# banks use) or 'actual' for 366 in leap years.
+def daily_accrual_rates(interest_rate, start_year, start_month, num_months, day_count=365):
+    first_month = np.datetime64(f"{start_year}-{start_month:02d}", 'M')
+    month_starts = (first_month + np.arange(num_months + 1)).astype('datetime64[D]')
+    days = np.arange(month_starts[0], month_starts[-1])
+
+    if day_count == 'actual':
+        years = days.astype('datetime64[Y]')
+        year_length = ((years + 1).astype('datetime64[D]') - years.astype('datetime64[D]')).astype(float)
+    else:
+        year_length = float(day_count)
+    daily_rate = float(interest_rate) / 100 / year_length * np.ones(days.size)
+
+    # Roll the days up into their payment month
+    return np.add.reduceat(daily_rate, (month_starts[:-1] - month_starts[0]).astype(np.int64))
+
+
+# Level instalment that pays off one loan over loan_term years with interest
+# accrued daily from the start month: loan_amount over the sum of the discount
+# factors 1/G_n, where G_n is the growth of R1 over n months. It is slightly
+# above the monthly-compounding payment since 365-day accrual charges more.
+def daily_accrual_payment(loan_amount, interest_rate, loan_term, start_year, start_month, day_count=365):
+    term_months = int(round(loan_term * 12))
+    if term_months < 1:
+        return np.inf  # No payments to repay it with, as monthly_payment over a zero term
+    rate = daily_accrual_rates(interest_rate, start_year, start_month, term_months, day_count)
+    return float(loan_amount) / np.sum(1 / np.cumprod(1 + rate))
+
+
+# Schedule for one loan whose interest accrues daily and is debited monthly.
+# The instalment (plus any extra payment) is solved from the daily growth
+# factors, so it pays the loan off over the term like a bank's; the last
+# payment settles the rounding residue. The balance recursion over varying
+# monthly rates is solved with cumulative products rather than a loop.
+def daily_accrual_schedule(loan_amount, interest_rate, loan_term, start_year, start_month, extra_payment=0, day_count=365):
+    term_months = int(round(loan_term * 12))
+    if term_months < 1:
+        # No payments, as amortization_schedule over a zero term
+        empty = np.empty(0)
+        return _schedule_frame([{'month': np.empty(0, dtype=np.int64), 'payment': empty, 'principal': empty, 'interest': empty, 'balance': empty}])
+    rate = daily_accrual_rates(interest_rate, start_year, start_month, term_months, day_count)
+
+    # b_n = G_n * (L - P * sum_{k<=n} 1/G_k), where G_n is the growth of R1 over n months
+    growth = np.cumprod(1 + rate)
+    payment = float(loan_amount) / np.sum(1 / growth) + extra_payment
+    balance = growth * (loan_amount - payment * np.cumsum(1 / growth))
+
+    # Stop at the first month the payment clears the balance; otherwise the last payment settles it
+    cleared = np.flatnonzero(balance < BALANCE_TOLERANCE)
+    num_months = cleared[0] + 1 if cleared.size else term_months
+    rate = rate[:num_months]
+    balance = balance[:num_months].copy()
+    balance[-1] = 0.0
+
+    opening = np.concatenate(([float(loan_amount)], balance[:-1]))
+    interest = opening * rate
+    principal = opening - balance
+    return _schedule_frame([{
+        'month': np.arange(1, num_months + 1),
+        'payment': principal + interest,
+        'principal': principal,
+        'interest': interest,
+        'balance': balance,
+    }])
+
+
+# First day of each payment month, payment 1 falling in the selected start month
+def payment_dates(start_year, start_month, num_payments, first_payment=1):
+    import pandas as pd
+
+    first_month = start_year * 12 + start_month - 2 + first_payment
+    return pd.date_range(f"{first_month // 12}-{first_month % 12 + 1:02d}-01", periods=num_payments, freq='MS')
+
+
+# Numeric table of a schedule, or of a run of its rows such as one page, for
+# display: payment month plus the amounts. Currency formatting is left to the
+# table widget.
+def schedule_table(schedule, start_year, start_month):
+    import pandas as pd
+
+    first_payment = int(schedule['Month'].iloc[0]) if len(schedule) else 1
+    return pd.DataFrame({
+        'Month': payment_dates(start_year, start_month, len(schedule), first_payment),
+        'Payment': schedule['Monthly Payment'].to_numpy(),
+        'Principal': schedule['Principal Payment'].to_numpy(),
+        'Interest': schedule['Interest Payment'].to_numpy(),
+        'Balance': schedule['Remaining Balance'].to_numpy(),
+    })
+
+
+# Number of whole monthly payments needed to clear loan_amount (NPER, rounded up).
+# Returns inf where the payment does not cover the first month's interest.
+def payoff_months(loan_amount, interest_rate, payment):
+    loan_amount = np.asarray(loan_amount, dtype=float)
+    payment = np.asarray(payment, dtype=float)
+    rate = monthly_rate(interest_rate)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        never_amortizes = payment <= loan_amount * rate
+        months = np.where(
+            rate == 0,
+            loan_amount / payment,
+            -np.log1p(-rate * loan_amount / payment) / np.log1p(rate),
+        )
+        months = np.ceil(months - 1e-9)
+    months = np.where(loan_amount <= 0, 0.0, np.where(never_amortizes, np.inf, months))
+    return _squeeze(months)
+
+
+# Payment, payoff term and total interest for any number of loans at once.
+# Matches amortization_schedule: an extra payment shortens the loan and the last
+# payment only clears what is left. Loans that never amortize get inf.
+def loan_summary(loan_amount, interest_rate, loan_term, extra_payment=0):
+    loan_amount = np.asarray(loan_amount, dtype=float)
+    extra_payment = np.asarray(extra_payment, dtype=float)
+    rate = monthly_rate(interest_rate)
+    term_months = np.round(np.asarray(loan_term, dtype=float) * 12)
+
+    payment = np.asarray(monthly_payment(loan_amount, interest_rate, loan_term), dtype=float)
+    total_payment = payment + extra_payment
+    num_payments = payoff_months(loan_amount, interest_rate, total_payment)
+    num_payments = np.where(np.isinf(num_payments), num_payments, np.minimum(num_payments, term_months))
+
+    # Everything before the last payment is level; the last one clears the balance
+    with np.errstate(invalid='ignore'):
+        before_last = np.where(np.isfinite(num_payments), np.maximum(num_payments - 1, 0), 0)
+        last_payment = remaining_balance(loan_amount, rate, total_payment, before_last) * (1 + rate)
+        total_paid = total_payment * before_last + np.where(num_payments > 0, last_payment, 0)
+        total_interest = np.where(np.isfinite(num_payments), total_paid - loan_amount, np.inf)
+
+    return {
+        'monthly_payment': _squeeze(payment),
+        'total_payment': _squeeze(total_payment),
+        'num_payments': _squeeze(num_payments),
+        'total_interest': _squeeze(total_interest),
+    }
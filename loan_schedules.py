@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk amortization schedules for a file of loans, spread over a process pool.
+
+Takes the same input as loan_batch.py (loan_amount, interest_rate,
+loan_term, optional extra_payment and start_date, plus pass-through ID
+columns) and writes one row per loan-month with the columns
+loan_engine.amortization_schedule produces, plus the payment date when
+start_date is given.
+
+With --exact, every amount is rounded to the cent month by month and the
+final payment settles the rounding (see loan_engine.cent_amortization_arrays).
+
+Chunks of loans are scheduled in worker processes and written to CSV or
+Parquet in input order as they finish. Only a few chunks are in flight at a
+time, so memory stays flat however large the input is.
+
+    python loan_schedules.py loans.csv schedules.parquet --workers 8 --chunksize 2000
+"""
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import loan_batch
+import loan_engine
+
+DEFAULT_CHUNKSIZE = 2000
+INPUT_COLUMNS = ['loan_amount', 'interest_rate', 'loan_term', 'extra_payment', 'start_date']
+
+
+# Long-format schedules for every loan in a DataFrame, in one vectorised pass
+def schedule_loans(loans, exact=False):
+    missing = [column for column in loan_batch.REQUIRED_COLUMNS if column not in loans.columns]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+
+    extra_payment = loans['extra_payment'].fillna(0).to_numpy(dtype=float) if 'extra_payment' in loans else 0.0
+    build_arrays = loan_engine.cent_amortization_arrays if exact else loan_engine.amortization_arrays
+    arrays = build_arrays(
+        loans['loan_amount'].to_numpy(dtype=float),
+        loans['interest_rate'].to_numpy(dtype=float),
+        loans['loan_term'].to_numpy(dtype=float),
+        extra_payment,
+    )
+    loan_index = arrays['loan_index']
+    # Cent-exact amounts are written in rands
+    scale = 100 if exact else 1
+
+    # ID columns (anything that is not a loan input) are repeated onto every month
+    schedules = {column: loans[column].to_numpy()[loan_index] for column in loans.columns if column not in INPUT_COLUMNS}
+    schedules['Month'] = arrays['month']
+    if 'start_date' in loans:
+        start = pd.to_datetime(loans['start_date']).to_numpy().astype('datetime64[M]')
+        schedules['Payment Date'] = (start[loan_index] + (arrays['month'] - 1).astype('timedelta64[M]')).astype('datetime64[ns]')
+    schedules['Principal Payment'] = arrays['principal'] / scale
+    schedules['Interest Payment'] = arrays['interest'] / scale
+    schedules['Remaining Balance'] = arrays['balance'] / scale
+    return pd.DataFrame(schedules)
+
+
+# Write schedules for every loan in source to destination. Returns the rows written.
+def generate_schedules(source, destination, workers=None, chunksize=DEFAULT_CHUNKSIZE, exact=False):
+    workers = workers or os.cpu_count() or 1
+    with loan_batch.ChunkWriter(destination) as writer:
+        if workers == 1:
+            for chunk in loan_batch.read_chunks(source, chunksize):
+                writer.write(schedule_loans(chunk, exact))
+            return writer.rows
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for chunk in loan_batch.read_chunks(source, chunksize):
+                pending.append(pool.submit(schedule_loans, chunk, exact))
+                # Bound the work in flight; write finished chunks in input order
+                while len(pending) >= workers * 2:
+                    writer.write(pending.popleft().result())
+            while pending:
+                writer.write(pending.popleft().result())
+    return writer.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate amortization schedules for a file of loans.")
+    parser.add_argument("source", help="input loans (.csv or .parquet)")
+    parser.add_argument("destination", help="output schedules (.csv, .parquet or .xlsx)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: number of CPUs)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="loans per work unit (default: %(default)s)")
+    parser.add_argument("--exact", action="store_true", help="round every payment and interest amount to the cent")
+    args = parser.parse_args(argv)
+
+    try:
+        rows = generate_schedules(args.source, args.destination, args.workers, args.chunksize, args.exact)
+    except ValueError as e:
+        parser.exit(2, f"error: {e}\n")
+    print(f"Wrote {rows:,} schedule rows -> {args.destination}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Rate x term x extra-payment sensitivity grid.
+
+The whole grid is one broadcast call to loan_engine.loan_summary, so a
+100 x 30 x 20 grid (60,000 scenarios) takes milliseconds instead of 60,000
+calls to calculate_loan_changes / calculate_loan_term.
+"""
+import numpy as np
+
+import loan_engine
+
+# Metrics that can be drawn as a heatmap: grid key -> (title, colour bar label)
+HEATMAP_METRICS = {
+    'total_interest': ('Total interest paid', 'Interest (R)'),
+    'payoff_years': ('Payoff term', 'Years'),
+    'total_payment': ('Monthly payment', 'Payment (R)'),
+}
+
+
+# Evaluate every combination of rates (%), terms (years) and extra payments (R)
+def sensitivity_grid(loan_amount, rates, terms, extra_payments):
+    rates = np.asarray(rates, dtype=float)
+    terms = np.asarray(terms, dtype=float)
+    extra_payments = np.asarray(extra_payments, dtype=float)
+
+    summary = loan_engine.loan_summary(
+        loan_amount,
+        rates[:, None, None],
+        terms[None, :, None],
+        extra_payments[None, None, :],
+    )
+    shape = (rates.size, terms.size, extra_payments.size)
+
+    return {
+        'rates': rates,
+        'terms': terms,
+        'extra_payments': extra_payments,
+        'total_payment': np.broadcast_to(summary['total_payment'], shape),
+        'total_interest': np.broadcast_to(summary['total_interest'], shape),
+        'payoff_years': np.broadcast_to(summary['num_payments'], shape) / 12,
+    }
+
+
+# Heatmap of one metric over rate x term for the extra payment at extra_index
+def sensitivity_heatmap(grid, metric='total_interest', extra_index=0):
+    import plotly.graph_objects as go
+
+    title, colorbar_title = HEATMAP_METRICS[metric]
+    values = grid[metric][:, :, extra_index]
+    # Never-amortizing scenarios are left blank rather than stretching the colour scale
+    values = np.where(np.isfinite(values), values, np.nan)
+
+    figure = go.Figure(go.Heatmap(
+        x=grid['terms'],
+        y=grid['rates'],
+        z=values,
+        colorscale='Blues',
+        colorbar=dict(title=colorbar_title),
+        hovertemplate='Term: %{x} years<br>Rate: %{y:.2f}%<br>' + colorbar_title + ': %{z:,.2f}<extra></extra>',
+    ))
+    figure.update_layout(
+        title=f"{title} with R{grid['extra_payments'][extra_index]:,.0f} extra per month",
+        xaxis_title='Loan Term (Years)',
+        yaxis_title='Interest Rate (%)',
+    )
+    return figure
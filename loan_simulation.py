@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo simulation of a prime-linked (variable-rate) home loan.
+
+Annual rates follow a mean-reverting (Ornstein-Uhlenbeck) process around
+the quoted rate, floored at 0% and moved in 0.25% steps like prime. Whenever
+the rate changes, the instalment is reset to repay the balance over the
+remaining term at the new rate, as banks do for prime-linked bonds. Any
+extra payment is paid on top of the instalment.
+
+The balance recursion runs across all paths of a chunk at once, with a
+(paths x months) rate matrix. Paths are processed in chunks and balances are
+folded into fixed per-month histograms, so memory is bounded by the chunk
+size however many paths are simulated. Per-path total interest and payoff
+month are kept (one float each) for exact percentiles.
+"""
+import numpy as np
+
+import loan_engine
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+DEFAULT_CHUNK_PATHS = 5000
+DEFAULT_RATE_STEP = 0.25
+HISTOGRAM_BINS = 2000
+
+
+# Annual rate paths (%), one row per path; month 1 uses the current rate.
+# The underlying process is continuous; the applied rate moves in rate_step steps.
+def simulate_rate_paths(rng, num_paths, num_months, initial_rate, mean_rate, reversion, volatility, rate_step=DEFAULT_RATE_STEP):
+    if num_months < 1:
+        return np.empty((num_paths, 0))
+    dt = 1 / 12
+    shocks = rng.standard_normal((num_paths, num_months - 1)) * volatility * np.sqrt(dt)
+    rates = np.empty((num_paths, num_months))
+    rates[:, 0] = initial_rate
+    latent = np.full(num_paths, float(initial_rate))
+    for month in range(1, num_months):
+        latent = np.maximum(latent + reversion * (mean_rate - latent) * dt + shocks[:, month - 1], 0)
+        if rate_step:
+            # Only move the applied rate once the process has drifted a full step away
+            moved = np.abs(latent - rates[:, month - 1]) >= rate_step
+            rates[:, month] = np.where(moved, np.round(latent / rate_step) * rate_step, rates[:, month - 1])
+        else:
+            rates[:, month] = latent
+    return rates
+
+
+# Balance after each month for every path, plus per-path total interest and payoff month
+def simulate_balances(loan_amount, rates, extra_payment=0):
+    num_paths, num_months = rates.shape
+    monthly_rates = loan_engine.monthly_rate(rates)
+    balances = np.empty((num_paths, num_months))
+    total_interest = np.zeros(num_paths)
+    payoff_month = np.full(num_paths, float(num_months))
+
+    balance = np.full(num_paths, float(loan_amount))
+    instalment = np.zeros(num_paths)
+    for month in range(num_months):
+        rate = monthly_rates[:, month]
+        # The instalment resets to clear the balance over the remaining term when the rate changes
+        reset = rate != monthly_rates[:, month - 1] if month else np.ones(num_paths, dtype=bool)
+        instalment[reset] = balance[reset] * loan_engine.annuity_factor(rate[reset], num_months - month)
+        payment = instalment + extra_payment
+        interest = balance * rate
+        balance = balance - np.minimum(payment - interest, balance)
+        balance[balance < loan_engine.BALANCE_TOLERANCE] = 0.0
+
+        newly_paid = (balance == 0) & (payoff_month == num_months)
+        payoff_month[newly_paid] = month + 1
+        total_interest += interest
+        balances[:, month] = balance
+    return balances, total_interest, payoff_month
+
+
+# Percentiles per month from a (months x bins) histogram over [0, upper]
+def _histogram_percentiles(histogram, upper, percentiles):
+    width = upper / histogram.shape[1]
+    cumulative = np.cumsum(histogram, axis=1)
+    total = cumulative[:, -1:]
+    result = {}
+    for percentile in percentiles:
+        target = total * percentile / 100
+        bin_index = np.argmax(cumulative >= target, axis=1)
+        below = np.take_along_axis(cumulative, bin_index[:, None], axis=1) - np.take_along_axis(histogram, bin_index[:, None], axis=1)
+        in_bin = np.take_along_axis(histogram, bin_index[:, None], axis=1)
+        fraction = np.where(in_bin > 0, (target - below) / np.maximum(in_bin, 1), 0)
+        result[percentile] = (bin_index + fraction[:, 0]) * width
+    return result
+
+
+# Percentile bands of balance, total interest and payoff month over num_paths rate paths
+def simulate_loan(loan_amount, interest_rate, loan_term, extra_payment=0, num_paths=10000,
+                  volatility=1.5, reversion=0.5, mean_rate=None, rate_step=DEFAULT_RATE_STEP,
+                  percentiles=DEFAULT_PERCENTILES, chunk_paths=DEFAULT_CHUNK_PATHS, seed=None):
+    num_months = max(int(round(loan_term * 12)), 0)  # A term under one month has no payments
+    mean_rate = interest_rate if mean_rate is None else mean_rate
+    rng = np.random.default_rng(seed)
+
+    # Balances never exceed the loan amount because the instalment always covers the interest
+    upper = max(float(loan_amount), 1.0)
+    histogram = np.zeros((num_months, HISTOGRAM_BINS), dtype=np.int64)
+    month_offsets = np.arange(num_months) * HISTOGRAM_BINS
+    total_interest = np.empty(num_paths)
+    payoff_month = np.empty(num_paths)
+
+    for start in range(0, num_paths, chunk_paths):
+        size = min(chunk_paths, num_paths - start)
+        rates = simulate_rate_paths(rng, size, num_months, interest_rate, mean_rate, reversion, volatility, rate_step)
+        balances, total_interest[start:start + size], payoff_month[start:start + size] = simulate_balances(loan_amount, rates, extra_payment)
+
+        bins = np.minimum((balances / upper * HISTOGRAM_BINS).astype(np.int64), HISTOGRAM_BINS - 1)
+        histogram += np.bincount((bins + month_offsets).ravel(), minlength=histogram.size).reshape(histogram.shape)
+
+    return {
+        'months': np.arange(1, num_months + 1),
+        'num_paths': num_paths,
+        'balance': _histogram_percentiles(histogram, upper, percentiles),
+        'total_interest': dict(zip(percentiles, np.percentile(total_interest, percentiles))),
+        'payoff_month': dict(zip(percentiles, np.percentile(payoff_month, percentiles))),
+    }
+
+
+# Shade the outer and inner percentile bands and draw the median on a balance chart
+def add_percentile_bands(figure, simulation, color='31, 119, 180'):
+    import plotly.graph_objects as go
+
+    balance = simulation['balance']
+    percentiles = sorted(balance)
+    months = simulation['months']
+    pairs = [(percentiles[0], percentiles[-1], 0.15), (percentiles[1], percentiles[-2], 0.3)] if len(percentiles) >= 4 else []
+
+    for low, high, opacity in pairs:
+        figure.add_trace(go.Scattergl(x=months, y=balance[high], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        figure.add_trace(go.Scattergl(
+            x=months, y=balance[low], mode='lines', line=dict(width=0), fill='tonexty',
+            fillcolor=f'rgba({color}, {opacity})', name=f'Variable rate P{low}-P{high}',
+        ))
+    if 50 in balance:
+        figure.add_trace(go.Scattergl(x=months, y=balance[50], mode='lines', line=dict(dash='dash', color=f'rgb({color})'), name='Variable rate median'))
+    return figure
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Local cache for the Lottie animations shown in the page header.
+
+Animations are read from LOTTIE_CACHE_DIR (default: assets/lottie next to this
+file). A missing animation is downloaded with a short timeout and written
+back to the cache directory when it is writable. Any failure, or
+LOTTIE_OFFLINE=1, means no animation instead of a hung rerun; a failed lookup
+is retried after LOTTIE_RETRY_SECONDS. While one session downloads an
+animation, other sessions go on without it rather than wait.
+
+Fill the cache at image build time so production never touches the network:
+
+    python lottie_cache.py <url> [<url> ...]
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+CACHE_DIR = os.environ.get("LOTTIE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "lottie"))
+TIMEOUT_SECONDS = float(os.environ.get("LOTTIE_TIMEOUT_SECONDS", 2))
+OFFLINE = os.environ.get("LOTTIE_OFFLINE", "").lower() in ("1", "true", "yes")
+RETRY_SECONDS = float(os.environ.get("LOTTIE_RETRY_SECONDS", 60))
+
+# Animations loaded in this process
+_loaded = {}
+# URL -> time.monotonic() of its last failed lookup
+_failed = {}
+# One lock per URL, held while that URL is read or downloaded
+_url_locks = {}
+_url_locks_lock = threading.Lock()
+
+
+# Cache file for a URL, named after a hash of the URL
+def cache_path(url):
+    return os.path.join(CACHE_DIR, hashlib.sha1(url.encode("utf-8")).hexdigest()[:16] + ".json")
+
+
+def _read_cached(url):
+    try:
+        with open(cache_path(url), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cached(url, animation):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_path(url), "w", encoding="utf-8") as f:
+            json.dump(animation, f)
+    except OSError:
+        pass  # Read-only image: keep the animation in memory only
+
+
+def _fetch(url, timeout):
+    import requests
+
+    try:
+        r = requests.get(url, timeout=timeout)
+    except requests.RequestException:
+        return None
+    if r.status_code != 200:
+        return None
+    try:
+        return r.json()
+    except ValueError:
+        return None
+
+
+def _url_lock(url):
+    with _url_locks_lock:
+        return _url_locks.setdefault(url, threading.Lock())
+
+
+def _recently_failed(url):
+    failed_at = _failed.get(url)
+    return failed_at is not None and time.monotonic() - failed_at < RETRY_SECONDS
+
+
+# Animation JSON for a URL, or None when it is unavailable (or another thread
+# is still loading it)
+def load_lottie(url, offline=None, timeout=None):
+    animation = _loaded.get(url)
+    if animation is not None or _recently_failed(url):
+        return animation
+
+    lock = _url_lock(url)
+    if not lock.acquire(blocking=False):
+        return None  # Being downloaded for another session; the animation is decorative
+    try:
+        if url in _loaded:
+            return _loaded[url]
+        animation = _read_cached(url)
+        if animation is None and not (OFFLINE if offline is None else offline):
+            animation = _fetch(url, TIMEOUT_SECONDS if timeout is None else timeout)
+            if animation is not None:
+                _write_cached(url, animation)
+        if animation is None:
+            _failed[url] = time.monotonic()
+        else:
+            _loaded[url] = animation
+            _failed.pop(url, None)
+        return animation
+    finally:
+        lock.release()
+
+
+# Download the given animations into the cache directory
+def prefetch(urls, timeout=None):
+    return {url: load_lottie(url, offline=False, timeout=timeout) is not None for url in urls}
+
+
+if __name__ == "__main__":
+    results = prefetch(sys.argv[1:], timeout=30)
+    for url, ok in results.items():
+        print(("cached  " if ok else "FAILED  ") + url + " -> " + cache_path(url))
+    sys.exit(0 if all(results.values()) else 1)
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide cache of computed loan scenarios.
+
+Streamlit reruns the whole script on every widget change, and every session
+runs in the same process, so identical scenarios are served from here both
+within one rerun and across users. The cache is bounded by entry count and
+age, configurable with the LOAN_CACHE_MAX_ENTRIES and LOAN_CACHE_TTL_SECONDS
+environment variables (a TTL of 0 disables expiry).
+
+Cached values are shared between sessions and must not be mutated.
+"""
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import loan_engine
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("LOAN_CACHE_MAX_ENTRIES", 256))
+DEFAULT_TTL_SECONDS = float(os.environ.get("LOAN_CACHE_TTL_SECONDS", 3600))
+
+_MISSING = object()
+
+
+class ScenarioCache:
+    # Thread-safe LRU cache with an optional time-to-live and hit/miss counters
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # Cached value for key, or default on a miss (expired entries count as misses)
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self.ttl or now - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            # Compute outside the lock so slow scenarios don't block other sessions
+            value = compute()
+            self.put(key, value)
+        return value
+
+    # Snapshot of the cached values, e.g. for sizing the cache
+    def values(self):
+        with self._lock:
+            return [value for _, value in self._entries.values()]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+            }
+
+
+# Shared by every session in this process
+cache = ScenarioCache()
+
+# Fixed-rate stretches of event schedules, keyed by their inputs, so editing one
+# event only recomputes the schedule from that event on
+segment_cache = ScenarioCache(max_entries=DEFAULT_MAX_ENTRIES * 4)
+
+
+def _compute_scenario(loan_amount, interest_rate, loan_term, extra_payment, rate_changes=(), lump_sums=(), daily_start=None,
+                      exact_cents=False):
+    monthly_payment = loan_engine.monthly_payment(loan_amount, interest_rate, loan_term)
+    payment_resets = None
+    if exact_cents:
+        # A zero term keeps its inf payment for display; there is nothing to round
+        if np.isfinite(monthly_payment):
+            monthly_payment = loan_engine.to_cents(monthly_payment)[()] / 100
+        schedule = loan_engine.cent_amortization_schedule(loan_amount, interest_rate, loan_term, extra_payment)
+    elif daily_start is not None:
+        # The daily-accrual instalment is above the monthly-compounding one
+        monthly_payment = loan_engine.daily_accrual_payment(loan_amount, interest_rate, loan_term, *daily_start)
+        schedule = loan_engine.daily_accrual_schedule(loan_amount, interest_rate, loan_term, *daily_start, extra_payment)
+    elif rate_changes or lump_sums:
+        schedule, payment_resets = loan_engine.event_schedule(
+            loan_amount, interest_rate, loan_term, dict(rate_changes), dict(lump_sums), extra_payment, segment_cache,
+        )
+    else:
+        schedule = loan_engine.amortization_schedule(loan_amount, interest_rate, loan_term, extra_payment)
+    return _scenario(monthly_payment, extra_payment, schedule, payment_resets)
+
+
+def _scenario(monthly_payment, extra_payment, schedule, payment_resets=None):
+    return {
+        'monthly_payment': monthly_payment,
+        'total_payment': monthly_payment + extra_payment,
+        'schedule': schedule,
+        'total_interest': schedule['Interest Payment'].sum(),
+        'num_payments': len(schedule),
+        'payoff_date': None,
+        'payment_resets': payment_resets,
+    }
+
+
+# Several plain (fixed-rate, monthly) scenarios from one amortization_arrays call,
+# one scenario per (loan_amount, interest_rate, loan_term, extra_payment) tuple
+def _compute_scenarios(inputs):
+    import pandas as pd
+
+    loan_amount, interest_rate, loan_term, extra_payment = (np.array(column, dtype=float) for column in zip(*inputs))
+    monthly_payment = np.atleast_1d(loan_engine.monthly_payment(loan_amount, interest_rate, loan_term))
+    arrays = loan_engine.amortization_arrays(loan_amount, interest_rate, loan_term, extra_payment)
+
+    # Rows are grouped by loan, so each scenario is one slice of the flat arrays
+    bounds = np.searchsorted(arrays['loan_index'], np.arange(len(inputs) + 1))
+    scenarios = []
+    for index, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        schedule = pd.DataFrame({
+            'Month': arrays['month'][start:end],
+            'Monthly Payment': arrays['payment'][start:end],
+            'Principal Payment': arrays['principal'][start:end],
+            'Interest Payment': arrays['interest'][start:end],
+            'Remaining Balance': arrays['balance'][start:end],
+        }, columns=loan_engine.SCHEDULE_COLUMNS)
+        scenarios.append(_scenario(monthly_payment[index], extra_payment[index], schedule))
+    return scenarios
+
+
+# Same scenario with the payoff date for a start month (the month after the last payment)
+def _with_payoff_date(scenario, start_year, start_month):
+    import pandas as pd
+
+    payoff_date = pd.Timestamp(year=start_year, month=start_month, day=1) + pd.DateOffset(months=scenario['num_payments'])
+    return dict(scenario, payoff_date=payoff_date)
+
+
+# Hashable form of an event mapping ({payment number: value}) for cache keys
+def _events(events):
+    return tuple(sorted((int(month), float(value)) for month, value in (events or {}).items()))
+
+
+# Cache key of a scenario without events, daily accrual or cent rounding
+def _plain_key(loan_amount, interest_rate, loan_term, extra_payment):
+    return (float(loan_amount), float(interest_rate), float(loan_term), float(extra_payment), (), (), None, False)
+
+
+# Payment, schedule, total interest and payoff date for one scenario, cached.
+# Dated lookups share the undated entry, so the schedule is only computed once.
+# rate_changes ({payment number: annual rate}) and lump_sums ({payment number:
+# amount}) switch to an event schedule; monthly_payment is then the instalment
+# before the first rate change.
+# daily_accrual accrues interest on actual calendar days from the start month;
+# it needs a start month and applies to loans without events. exact_cents rounds
+# every payment and month's interest to the cent (monthly accrual, no events).
+def loan_scenario(loan_amount, interest_rate, loan_term, extra_payment=0, start_year=None, start_month=None,
+                  rate_changes=None, lump_sums=None, daily_accrual=False, exact_cents=False):
+    rate_changes = _events(rate_changes)
+    lump_sums = _events(lump_sums)
+    exact_cents = bool(exact_cents and not (rate_changes or lump_sums or daily_accrual))
+    daily_start = None
+    if daily_accrual and start_year is not None and not (rate_changes or lump_sums):
+        daily_start = (int(start_year), int(start_month))
+    key = _plain_key(loan_amount, interest_rate, loan_term, extra_payment)[:4] + (rate_changes, lump_sums, daily_start, exact_cents)
+    scenario = cache.get_or_compute(
+        key + (None, None),
+        lambda: _compute_scenario(loan_amount, interest_rate, loan_term, extra_payment, rate_changes, lump_sums, daily_start, exact_cents),
+    )
+    if start_year is None:
+        return scenario
+    return cache.get_or_compute(
+        key + (start_year, start_month),
+        lambda: _with_payoff_date(scenario, start_year, start_month),
+    )
+
+
+# Payment, total interest, number of payments and payoff date (a datetime.date,
+# the month after the last payment) of a plain scenario from the closed form,
+# without building its schedule. Totals match loan_scenario; this only needs
+# numpy, so a page can show them before pandas is loaded.
+def scenario_summary(loan_amount, interest_rate, loan_term, extra_payment=0, start_year=None, start_month=None):
+    key = ('summary',) + _plain_key(loan_amount, interest_rate, loan_term, extra_payment)[:4] + (start_year, start_month)
+    return cache.get_or_compute(key, lambda: _summary(loan_amount, interest_rate, loan_term, extra_payment, start_year, start_month))
+
+
+def _summary(loan_amount, interest_rate, loan_term, extra_payment, start_year, start_month):
+    summary = loan_engine.loan_summary(loan_amount, interest_rate, loan_term, extra_payment)
+    # Never-amortizing loans keep inf payments and interest and have no payoff date
+    num_payments = int(summary['num_payments']) if np.isfinite(summary['num_payments']) else summary['num_payments']
+    payoff_date = None
+    if start_year is not None and np.isfinite(num_payments):
+        months = start_year * 12 + start_month - 1 + num_payments
+        payoff_date = datetime.date(months // 12, months % 12 + 1, 1)
+    return dict(summary, num_payments=num_payments, payoff_date=payoff_date)
+
+
+# loan_scenario for many plain scenarios at once, given as (loan_amount,
+# interest_rate, loan_term, extra_payment) tuples. Identical scenarios are
+# computed once, and everything not already cached is priced together in one
+# array pass. Returns the scenarios in input order.
+def loan_scenarios(inputs, start_year=None, start_month=None):
+    keys = [_plain_key(*scenario) for scenario in inputs]
+    found = {key: cache.get(key + (None, None)) for key in keys}
+    missing = [key for key, scenario in found.items() if scenario is None]
+    if missing:
+        for key, scenario in zip(missing, _compute_scenarios([key[:4] for key in missing])):
+            cache.put(key + (None, None), scenario)
+            found[key] = scenario
+
+    if start_year is None:
+        return [found[key] for key in keys]
+    return [
+        cache.get_or_compute(key + (start_year, start_month), lambda scenario=found[key]: _with_payoff_date(scenario, start_year, start_month))
+        for key in keys
+    ]
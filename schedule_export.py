@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Export amortization schedules to CSV, Parquet or Excel.
+
+Schedules are written from their numeric arrays in chunks of rows through
+loan_batch.ChunkWriter, so amounts stay numbers (not pre-formatted strings)
+and a long or multi-scenario export never builds the whole file as Python
+objects at once. Several schedules go into one file with a Scenario column.
+
+    with open("schedule.xlsx", "wb") as f:
+        export_schedules({"Original": schedule}, f, "xlsx", start_year=2023, start_month=1)
+
+Excel output needs the optional openpyxl package.
+"""
+import importlib.util
+import io
+
+import numpy as np
+
+import loan_batch
+import loan_engine
+
+DEFAULT_CHUNK_ROWS = 5000
+
+# Export format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'csv': ('.csv', 'text/csv'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'xlsx': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+# Optional package each format needs beyond pandas
+_FORMAT_PACKAGES = {'parquet': 'pyarrow', 'xlsx': 'openpyxl'}
+
+
+# Formats whose optional package is installed
+def available_formats():
+    return [
+        file_format for file_format in EXPORT_FORMATS
+        if file_format not in _FORMAT_PACKAGES or importlib.util.find_spec(_FORMAT_PACKAGES[file_format])
+    ]
+
+
+# Chunks of one schedule as export rows: scenario, payment number and date, amounts
+def schedule_chunks(schedule, scenario=None, start_year=None, start_month=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    import pandas as pd
+
+    columns = {name: schedule[name].to_numpy() for name in loan_engine.SCHEDULE_COLUMNS}
+    if start_year is not None:
+        first_month = np.datetime64(f"{start_year}-{start_month:02d}", 'M')
+        dates = (first_month + (columns['Month'] - 1).astype('timedelta64[M]')).astype('datetime64[ns]')
+
+    for start in range(0, len(schedule), chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        chunk = {} if scenario is None else {'Scenario': scenario}
+        chunk['Month'] = columns['Month'][rows]
+        if start_year is not None:
+            chunk['Payment Date'] = dates[rows]
+        for name in loan_engine.SCHEDULE_COLUMNS[1:]:
+            chunk[name] = columns[name][rows]
+        yield pd.DataFrame(chunk)
+
+
+# Write {scenario name: schedule} to destination (a path or binary file object)
+# as file_format ('csv', 'parquet' or 'xlsx'). A single schedule is written
+# without the Scenario column. Returns the number of rows written.
+def export_schedules(schedules, destination, file_format=None, start_year=None, start_month=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    with_scenario = len(schedules) > 1
+    with loan_batch.ChunkWriter(destination, file_format) as writer:
+        for scenario, schedule in schedules.items():
+            for chunk in schedule_chunks(schedule, scenario if with_scenario else None, start_year, start_month, chunk_rows):
+                writer.write(chunk)
+    return writer.rows
+
+
+# The exported file as bytes, e.g. for st.download_button
+def export_bytes(schedules, file_format, start_year=None, start_month=None):
+    buffer = io.BytesIO()
+    export_schedules(schedules, buffer, file_format, start_year, start_month)
+    return buffer.getvalue()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Memory held by one Streamlit session, for sizing how many sessions a server
+process can hold.
+
+Sizes are deep: DataFrames and arrays count their data, containers count
+their contents. Anything also held by the process-wide scenario cache is
+shared between sessions and reported separately, so a session's own bytes
+are what it would cost to add one more user.
+
+    report = session_memory.session_report(st.session_state)
+    report['session_bytes']   # owned by this session
+    report['cache_bytes']     # shared scenario cache, once per process
+"""
+import sys
+
+import numpy as np
+
+import scenario_cache
+
+
+# Deep size of value in bytes, skipping objects whose id is in seen (and adding
+# everything counted to it, so shared parts are only counted once)
+def object_bytes(value, seen=None):
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, np.ndarray):
+        return sys.getsizeof(value) if value.base is None else value.nbytes
+    # pandas objects (imported lazily by the apps, so not referenced by type)
+    if hasattr(value, 'memory_usage') and hasattr(value, 'index'):
+        return int(np.sum(value.memory_usage(index=True, deep=True)))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(object_bytes(key, seen) + object_bytes(item, seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(object_bytes(item, seen) for item in value)
+    return size
+
+
+# Ids of the cached values and the objects directly inside them (a scenario's
+# schedule, payoff date, ...), which sessions only hold references to
+def _cached_ids(caches):
+    ids = set()
+    for cache in caches:
+        for value in cache.values():
+            ids.add(id(value))
+            if isinstance(value, dict):
+                ids.update(id(item) for item in value.values())
+    return ids
+
+
+# Bytes owned by each session_state entry, their total, and the size of the
+# shared scenario caches
+def session_report(session_state, caches=(scenario_cache.cache, scenario_cache.segment_cache)):
+    shared = _cached_ids(caches)
+    entries = {}
+    for key in list(session_state.keys()):
+        # Each entry gets its own copy of the shared ids; references between
+        # entries are rare and small
+        entries[str(key)] = object_bytes(session_state[key], set(shared))
+
+    cache_seen = set()
+    cache_bytes = sum(object_bytes(value, cache_seen) for cache in caches for value in cache.values())
+    return {
+        'session_bytes': sum(entries.values()),
+        'entries': dict(sorted(entries.items(), key=lambda item: -item[1])),
+        'cache_bytes': cache_bytes,
+        'cache_entries': sum(len(cache.values()) for cache in caches),
+    }
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Optional per-rerun stage timing for the Streamlit apps.
+
+Enable with the LOAN_CALC_TIMING=1 environment variable (every session) or
+the ?timing=1 query parameter (one session). Each rerun then logs one JSON
+line to the "homeloancalc.timing" logger and shows a debug panel at the
+bottom of the page. When disabled, lap() only checks a flag.
+
+Usage in a script (started before the heavy imports so a cold start counts them):
+
+    run_timer = stage_timer.start_run("homeloancalculator")
+    ...
+    run_timer.lap("lottie")      # time since the previous lap
+    run_timer.mark("first_summary")   # time since the run started
+    ...
+    run_timer.finish()
+
+The first run in a process is flagged as cold: it is the one that pays for
+importing pandas, plotly and the animation component. Each record also
+reports the memory the session holds (see session_memory) and the hit/miss
+counters of the process-wide scenario caches, for sizing them to the traffic.
+"""
+import json
+import logging
+import os
+import sys
+import time
+
+ENV_ENABLED = os.environ.get("LOAN_CALC_TIMING", "").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger("homeloancalc.timing")
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# Runs started in this process, to flag the cold first run
+_runs = 0
+
+
+class RunTimer:
+    # Records the time between consecutive laps of one script run
+
+    def __init__(self, script, enabled, cold=False):
+        self.script = script
+        self.enabled = enabled
+        self.cold = cold
+        self.stages = {}
+        self.marks = {}
+        self._started = self._last = time.perf_counter()
+
+    def lap(self, stage):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        # A stage name used twice in one run accumulates
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    # Time from the start of the run to a milestone, e.g. the summary being on screen
+    def mark(self, name):
+        if not self.enabled:
+            return
+        self.marks[name] = (time.perf_counter() - self._started) * 1000
+
+    def record(self):
+        return {
+            "event": "rerun_timing",
+            "script": self.script,
+            "session_id": _session_id(),
+            "timestamp": time.time(),
+            "cold": self.cold,
+            "total_ms": round((self._last - self._started) * 1000, 3),
+            "stages_ms": {stage: round(ms, 3) for stage, ms in self.stages.items()},
+            "marks_ms": {name: round(ms, 3) for name, ms in self.marks.items()},
+            "memory": _memory_report(),
+            "caches": _cache_stats(),
+        }
+
+    # Log the structured line and draw the debug panel
+    def finish(self):
+        if not self.enabled:
+            return None
+        record = self.record()
+        logger.info(json.dumps(record))
+        _show_panel(record)
+        return record
+
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else None
+    except ImportError:
+        return None
+
+
+def _memory_report():
+    try:
+        import streamlit as st
+
+        import session_memory
+
+        return session_memory.session_report(st.session_state)
+    except Exception:
+        return None
+
+
+# Counters of the scenario caches shared by every session in this process
+def _cache_stats():
+    try:
+        import scenario_cache
+
+        return {"scenario": scenario_cache.cache.stats(), "segment": scenario_cache.segment_cache.stats()}
+    except Exception:
+        return None
+
+
+def _show_panel(record):
+    import streamlit as st
+
+    cold_text = " (cold start)" if record["cold"] else ""
+    with st.expander(f"Rerun timing: {record['total_ms']:.1f} ms{cold_text}"):
+        if record["marks_ms"]:
+            st.caption(", ".join(f"{name}: {ms:.1f} ms" for name, ms in record["marks_ms"].items()))
+        memory = record["memory"]
+        if memory:
+            st.caption(
+                f"Session state: {memory['session_bytes'] / 1024:,.1f} KB. "
+                f"Scenario cache (shared by all sessions): {memory['cache_bytes'] / 1024:,.1f} KB in {memory['cache_entries']} entries."
+            )
+        for name, stats in (record["caches"] or {}).items():
+            st.caption(
+                f"{name.capitalize()} cache: {stats['hit_rate']:.0%} hit rate ({stats['hits']:,} hits, {stats['misses']:,} misses), "
+                f"{stats['size']:,} of {stats['max_entries']:,} entries, {stats['evictions']:,} evictions, {stats['expirations']:,} expirations."
+            )
+        st.dataframe(
+            {"Stage": list(record["stages_ms"]), "Time (ms)": list(record["stages_ms"].values())},
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
+def _query_enabled():
+    try:
+        import streamlit as st
+
+        return st.query_params.get("timing", "").lower() in ("1", "true", "yes")
+    except Exception:
+        return False
+
+
+# Start timing a script run if instrumentation is enabled for this session
+def start_run(script):
+    global _runs
+    _runs += 1
+    return RunTimer(script, ENV_ENABLED or _query_enabled(), cold=_runs == 1)